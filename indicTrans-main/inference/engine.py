@@ -1,10 +1,16 @@
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from os import truncate
 from sacremoses import MosesPunctNormalizer
 from sacremoses import MosesTokenizer
 from sacremoses import MosesDetokenizer
 from subword_nmt.apply_bpe import BPE, read_vocabulary
 import codecs
-from tqdm import tqdm
 from indicnlp.tokenize import indic_tokenize
 from indicnlp.tokenize import indic_detokenize
 from indicnlp.normalize import indic_normalize
@@ -17,6 +23,30 @@ from IndicTransToolkit.custom_interactive import Translator
 
 INDIC = ["as", "bn", "gu", "hi", "kn", "ml", "mr", "or", "pa", "ta", "te"]
 
+# number of distinct (sentence, src_lang, tgt_lang) encodings memoized per model
+ENCODE_CACHE_SIZE = 8192
+
+# number of distinct words whose BPE segmentation is kept per set of codes
+BPE_CACHE_SIZE = 100000
+
+# batches smaller than this are encoded in-process even when a pool is configured
+PARALLEL_THRESHOLD = 2000
+# sentences sent to a preprocessing worker per task
+PARALLEL_CHUNK_SIZE = 500
+
+_normalizer_factory = indic_normalize.IndicNormalizerFactory()
+_normalizers = {}
+
+
+def get_normalizer(lang):
+    """return the Indic normalizer for lang, created once per process"""
+    normalizer = _normalizers.get(lang)
+    if normalizer is None:
+        normalizer = _normalizers.setdefault(
+            lang, _normalizer_factory.get_normalizer(lang)
+        )
+    return normalizer
+
 
 def split_sentences(paragraph, language):
     if language == "en":
@@ -51,43 +81,226 @@ def apply_lang_tags(sents, src_lang, tgt_lang):
     return tagged_sents
 
 
+def truncate_long_sentence(sent, max_seq_len=200):
+    words = sent.split()
+    num_words = len(words)
+    if num_words > max_seq_len:
+        print_str = " ".join(words[:5]) + " .... " + " ".join(words[-5:])
+        sent = " ".join(words[:max_seq_len])
+        print(
+            f"WARNING: Sentence {print_str} truncated to {max_seq_len} tokens as it exceeds maximum length limit"
+        )
+    return sent
+
+
 def truncate_long_sentences(sents):
+    return [truncate_long_sentence(sent) for sent in sents]
 
-    MAX_SEQ_LEN = 200
-    new_sents = []
 
-    for sent in sents:
-        words = sent.split()
-        num_words = len(words)
-        if num_words > MAX_SEQ_LEN:
-            print_str = " ".join(words[:5]) + " .... " + " ".join(words[-5:])
-            sent = " ".join(words[:MAX_SEQ_LEN])
-            print(
-                f"WARNING: Sentence {print_str} truncated to 200 tokens as it exceeds maximum length limit"
+class SentenceEncoder:
+    """turns raw source sentences into tagged BPE model input
+
+    normalization, tokenization, script conversion, BPE, language tags and
+    truncation run as one function per sentence, memoized so repeated
+    sentences (greetings, UI strings, boilerplate) are only encoded once
+    """
+
+    def __init__(self, bpe, cache_size=ENCODE_CACHE_SIZE):
+        self.en_tok = MosesTokenizer(lang="en")
+        self.en_normalizer = MosesPunctNormalizer()
+        self.bpe = bpe
+        self.encode = lru_cache(maxsize=cache_size)(self._encode)
+
+    def preprocess(self, sent, lang):
+        """normalize, tokenize and script convert (for Indic) one sentence"""
+        if lang == "en":
+            return " ".join(
+                self.en_tok.tokenize(
+                    self.en_normalizer.normalize(sent.strip()), escape=False
+                )
             )
+        else:
+            # line = indic_detokenize.trivial_detokenize(line.strip(), lang)
+            return unicode_transliterate.UnicodeIndicTransliterator.transliterate(
+                " ".join(
+                    indic_tokenize.trivial_tokenize(
+                        get_normalizer(lang).normalize(sent.strip()), lang
+                    )
+                ),
+                lang,
+                "hi",
+            ).replace(" ् ", "्")
 
-        new_sents.append(sent)
-    return new_sents
+    def _encode(self, sent, src_lang, tgt_lang):
+        bpe_sent = self.bpe.process_line(self.preprocess(sent, src_lang))
+        tagged_sent = add_token(bpe_sent.strip(), [("src", src_lang), ("tgt", tgt_lang)])
+        return truncate_long_sentence(tagged_sent)
+
+    def encode_batch(self, sents, src_lang, tgt_lang):
+        return [self.encode(sent, src_lang, tgt_lang) for sent in sents]
+
+
+class _NoCache(dict):
+    """stands in for subword-nmt's unbounded per-word memo"""
+
+    def __setitem__(self, key, value):
+        pass
+
+
+class CachedBPE:
+    """BPE segmentation with a bounded word-level LRU cache
+
+    word frequencies are Zipfian, so most words in a batch have been
+    segmented before; their subwords are reused instead of re-running
+    the merge loop. process_line matches BPE.process_line.
+    """
+
+    def __init__(self, bpe, cache_size=BPE_CACHE_SIZE):
+        self.bpe = bpe
+        self.separator = bpe.separator
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if hasattr(bpe, "cache"):
+            bpe.cache = _NoCache()
+
+    def segment_word(self, word):
+        with self._lock:
+            subwords = self._cache.get(word)
+            if subwords is not None:
+                self._cache.move_to_end(word)
+                self.hits += 1
+                return subwords
+            self.misses += 1
+
+        subwords = tuple(self.bpe.segment_tokens([word]))
+        with self._lock:
+            self._cache[word] = subwords
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return subwords
+
+    def segment_tokens(self, tokens):
+        output = []
+        for word in tokens:
+            # eliminate double spaces
+            if word:
+                output.extend(self.segment_word(word))
+        return output
+
+    def segment(self, sentence):
+        return " ".join(self.segment_tokens(sentence.strip("\r\n ").split(" ")))
+
+    def process_line(self, line):
+        """segment line, dealing with leading and trailing whitespace"""
+        out = ""
+
+        leading_whitespace = len(line) - len(line.lstrip("\r\n "))
+        if leading_whitespace:
+            out += line[:leading_whitespace]
+
+        out += self.segment(line)
+
+        trailing_whitespace = len(line) - len(line.rstrip("\r\n "))
+        if trailing_whitespace and trailing_whitespace != len(line):
+            out += line[-trailing_whitespace:]
+
+        return out
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "cache_size": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# (codes path, vocab path) -> (vocabulary, CachedBPE), shared by Model instances
+_bpe_registry = {}
+_bpe_registry_lock = threading.Lock()
+
+
+def load_bpe(expdir, bpe_cache_size=BPE_CACHE_SIZE):
+    """read the source vocabulary and BPE codes of an experiment directory
+
+    models that use the same codes and vocabulary share one CachedBPE, and
+    with it one word cache (sized by the largest bpe_cache_size requested)
+    """
+    vocab_path = os.path.realpath(f"{expdir}/vocab/vocab.SRC")
+    codes_path = os.path.realpath(f"{expdir}/vocab/bpe_codes.32k.SRC")
+    with _bpe_registry_lock:
+        entry = _bpe_registry.get((codes_path, vocab_path))
+        if entry is None:
+            vocabulary = read_vocabulary(codecs.open(vocab_path, encoding="utf-8"), 5)
+            bpe = BPE(
+                codecs.open(codes_path, encoding="utf-8"),
+                -1,
+                "@@",
+                vocabulary,
+                None,
+            )
+            entry = (vocabulary, CachedBPE(bpe, cache_size=bpe_cache_size))
+            _bpe_registry[(codes_path, vocab_path)] = entry
+        else:
+            entry[1].cache_size = max(entry[1].cache_size, bpe_cache_size)
+    return entry
+
+
+# per-process encoder of a preprocessing worker, set up by _init_encoder_worker
+_worker_encoder = None
+
+
+def _init_encoder_worker(expdir, encode_cache_size, bpe_cache_size):
+    global _worker_encoder
+    _, bpe = load_bpe(expdir, bpe_cache_size)
+    _worker_encoder = SentenceEncoder(bpe, cache_size=encode_cache_size)
+
+
+def _encode_chunk(sents, src_lang, tgt_lang):
+    return _worker_encoder.encode_batch(sents, src_lang, tgt_lang)
 
 
 class Model:
-    def __init__(self, expdir):
+    def __init__(
+        self,
+        expdir,
+        encode_cache_size=ENCODE_CACHE_SIZE,
+        bpe_cache_size=BPE_CACHE_SIZE,
+        preprocess_workers=0,
+        parallel_threshold=PARALLEL_THRESHOLD,
+        parallel_chunk_size=PARALLEL_CHUNK_SIZE,
+    ):
+        """
+        bpe_cache_size: number of words whose BPE segmentation is cached; the
+        cache is shared with other models that use the same BPE codes.
+
+        preprocess_workers: size of the process pool used to preprocess and
+        BPE-encode large batches in batch_translate (0 keeps everything
+        in-process). Batches below parallel_threshold sentences are always
+        encoded in-process; larger ones are sent to the pool in chunks of
+        parallel_chunk_size and reassembled in order.
+        """
         self.expdir = expdir
-        self.en_tok = MosesTokenizer(lang="en")
-        self.en_normalizer = MosesPunctNormalizer()
+        self.encode_cache_size = encode_cache_size
+        self.bpe_cache_size = bpe_cache_size
+        self.preprocess_workers = preprocess_workers
+        self.parallel_threshold = parallel_threshold
+        self.parallel_chunk_size = parallel_chunk_size
+        self._pool = None
+        self._pool_lock = threading.Lock()
         self.en_detok = MosesDetokenizer(lang="en")
         self.xliterator = unicode_transliterate.UnicodeIndicTransliterator()
         print("Initializing vocab and bpe")
-        self.vocabulary = read_vocabulary(
-            codecs.open(f"{expdir}/vocab/vocab.SRC", encoding="utf-8"), 5
-        )
-        self.bpe = BPE(
-            codecs.open(f"{expdir}/vocab/bpe_codes.32k.SRC", encoding="utf-8"),
-            -1,
-            "@@",
-            self.vocabulary,
-            None,
-        )
+        self.vocabulary, self.bpe = load_bpe(expdir, bpe_cache_size)
+        self.encoder = SentenceEncoder(self.bpe, cache_size=encode_cache_size)
+        self.en_tok = self.encoder.en_tok
+        self.en_normalizer = self.encoder.en_normalizer
 
         print("Initializing model for translation")
         # initialize the model
@@ -99,16 +312,49 @@ class Model:
     def batch_translate(self, batch, src_lang, tgt_lang):
 
         assert isinstance(batch, list)
-        preprocessed_sents = self.preprocess(batch, lang=src_lang)
-        bpe_sents = self.apply_bpe(preprocessed_sents)
-        tagged_sents = apply_lang_tags(bpe_sents, src_lang, tgt_lang)
-        tagged_sents = truncate_long_sentences(tagged_sents)
+        tagged_sents = self.encode_batch(batch, src_lang, tgt_lang)
 
         translations = self.translator.translate(tagged_sents)
         postprocessed_sents = self.postprocess(translations, tgt_lang)
 
         return postprocessed_sents
 
+    def _get_pool(self):
+        # workers are spawned rather than forked so they never inherit the
+        # translator's CUDA context; they live as long as the model
+        with self._pool_lock:
+            if self._pool is None:
+                print(f"Starting {self.preprocess_workers} preprocessing workers")
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.preprocess_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_encoder_worker,
+                    initargs=(self.expdir, self.encode_cache_size, self.bpe_cache_size),
+                )
+            return self._pool
+
+    def encode_batch(self, batch, src_lang, tgt_lang):
+        """preprocess, BPE-encode and tag a batch, in a process pool if it is large"""
+        if self.preprocess_workers <= 0 or len(batch) < self.parallel_threshold:
+            return self.encoder.encode_batch(batch, src_lang, tgt_lang)
+
+        chunks = [
+            batch[i : i + self.parallel_chunk_size]
+            for i in range(0, len(batch), self.parallel_chunk_size)
+        ]
+        # map yields chunk results in submission order
+        encoded_chunks = self._get_pool().map(
+            _encode_chunk, chunks, repeat(src_lang), repeat(tgt_lang)
+        )
+        return [sent for chunk in encoded_chunks for sent in chunk]
+
+    def close(self):
+        """shut down the preprocessing workers, if any were started"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
     # translate a paragraph from src_lang to tgt_lang
     def translate_paragraph(self, paragraph, src_lang, tgt_lang):
 
@@ -122,23 +368,8 @@ class Model:
         return translated_paragraph
 
     def preprocess_sent(self, sent, normalizer, lang):
-        if lang == "en":
-            return " ".join(
-                self.en_tok.tokenize(
-                    self.en_normalizer.normalize(sent.strip()), escape=False
-                )
-            )
-        else:
-            # line = indic_detokenize.trivial_detokenize(line.strip(), lang)
-            return unicode_transliterate.UnicodeIndicTransliterator.transliterate(
-                " ".join(
-                    indic_tokenize.trivial_tokenize(
-                        normalizer.normalize(sent.strip()), lang
-                    )
-                ),
-                lang,
-                "hi",
-            ).replace(" ् ", "्")
+        # normalizer is kept for compatibility; the per-language one is cached
+        return self.encoder.preprocess(sent, lang)
 
     def preprocess(self, sents, lang):
         """
@@ -147,27 +378,7 @@ class Model:
 
         """
 
-        if lang == "en":
-
-            # processed_sents = Parallel(n_jobs=-1, backend="multiprocessing")(
-            #     delayed(preprocess_line)(line, None, lang) for line in tqdm(sents, total=num_lines)
-            # )
-            processed_sents = [
-                self.preprocess_sent(line, None, lang) for line in tqdm(sents)
-            ]
-
-        else:
-            normfactory = indic_normalize.IndicNormalizerFactory()
-            normalizer = normfactory.get_normalizer(lang)
-
-            # processed_sents = Parallel(n_jobs=-1, backend="multiprocessing")(
-            #     delayed(preprocess_line)(line, normalizer, lang) for line in tqdm(infile, total=num_lines)
-            # )
-            processed_sents = [
-                self.preprocess_sent(line, normalizer, lang) for line in tqdm(sents)
-            ]
-
-        return processed_sents
+        return [self.encoder.preprocess(line, lang) for line in sents]
 
     def postprocess(self, sents, lang, common_lang="hi"):
         """
@@ -196,3 +407,7 @@ class Model:
     def apply_bpe(self, sents):
 
         return [self.bpe.process_line(sent) for sent in sents]
+
+    def bpe_cache_stats(self):
+        """hit and miss counters of the word-level BPE cache (in this process)"""
+        return self.bpe.stats()
@@ -0,0 +1,241 @@
+"""Pluggable speech recognition backends.
+
+Both backends take 16 kHz mono float32 audio and return the same result
+shape as ``whisper.transcribe``: a dict with ``text``, ``language`` and
+``segments`` (each with ``start``, ``end`` and ``text``), so endpoints do
+not care which engine is configured.
+
+* ``whisper`` - the reference openai-whisper PyTorch model.
+* ``faster-whisper`` - CTranslate2 with int8 weights, several times faster
+  than float32 PyTorch on CPU-only hosts.
+
+The backend is chosen with ``ASR_BACKEND``; see ``load_asr_backend``.
+"""
+import logging
+import os
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from audio_decode import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Clips up to one Whisper window can share a padded batch
+MAX_BATCH_SECONDS = 30.0
+
+# whisper.transcribe's defaults for judging a decode as failed or silent
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class WhisperBackend:
+    """openai-whisper running in PyTorch."""
+
+    name = "whisper"
+
+    def __init__(self, model_size: str = "small", download_root: str = "models/whisper",
+                 device: Optional[str] = None, verbose: bool = False):
+        import torch
+        import whisper
+
+        self.model_size = model_size
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.verbose = verbose
+        self.model = whisper.load_model(model_size, device=self.device, download_root=download_root)
+
+    def transcribe(self, audio: np.ndarray, language: Optional[str] = None, task: str = "transcribe",
+                   initial_prompt: Optional[str] = None, condition_on_previous_text: bool = True) -> dict:
+        result = self.model.transcribe(
+            audio,
+            language=language,
+            task=task,
+            fp16=self.device == "cuda",  # Half precision is only a win on GPU
+            verbose=True if self.verbose else None,
+            initial_prompt=initial_prompt,
+            condition_on_previous_text=condition_on_previous_text
+        )
+        result["segments"] = [
+            {"start": s["start"], "end": s["end"], "text": s["text"]} for s in result.get("segments", [])
+        ]
+        return result
+
+    def _mel_window(self, audio: np.ndarray):
+        """Log-mel spectrogram of the first 30 s, zero-padded to a full window."""
+        import whisper
+
+        audio = whisper.pad_or_trim(audio)
+        n_mels = self.model.dims.n_mels
+        # Only large-v3 uses 128 mel bins; older whisper releases lack the argument
+        if n_mels == 80:
+            return whisper.log_mel_spectrogram(audio)
+        return whisper.log_mel_spectrogram(audio, n_mels=n_mels)
+
+    def detect_language(self, audio: np.ndarray) -> Tuple[str, float]:
+        """Detect the spoken language from the first 30 s mel window."""
+        mel = self._mel_window(audio)
+        _, probs = self.model.detect_language(mel.to(self.model.device))
+        language = max(probs, key=probs.get)
+        return language, float(probs[language])
+
+    def transcribe_batch(self, audios: List[np.ndarray], language: Optional[str] = None,
+                         task: str = "transcribe") -> List[dict]:
+        """Transcribe clips of at most 30 s in one padded encoder/decoder batch.
+
+        The batch is decoded greedily without timestamps and with the same
+        no-speech rule as ``whisper.transcribe``; each clip becomes a single
+        segment. Clips whose greedy output looks like a failed decode
+        (compression ratio above 2.4 or average log probability below -1.0)
+        are transcribed again with ``transcribe`` and its temperature
+        fallback, as is a batch of a single clip.
+        """
+        import torch
+        import whisper
+
+        if len(audios) == 1:
+            return [self.transcribe(audios[0], language=language, task=task)]
+
+        mel = torch.stack([self._mel_window(audio) for audio in audios]).to(self.model.device)
+        options = whisper.DecodingOptions(
+            task=task, language=language, without_timestamps=True, fp16=self.device == "cuda"
+        )
+        results = []
+        for audio, decoded in zip(audios, whisper.decode(self.model, mel, options)):
+            text = decoded.text
+            if decoded.no_speech_prob > NO_SPEECH_THRESHOLD and decoded.avg_logprob < LOGPROB_THRESHOLD:
+                text = ""
+            elif decoded.compression_ratio > COMPRESSION_RATIO_THRESHOLD or decoded.avg_logprob < LOGPROB_THRESHOLD:
+                logger.info(
+                    f"Batched decode failed the quality check (compression {decoded.compression_ratio:.2f}, "
+                    f"logprob {decoded.avg_logprob:.2f}); transcribing the clip again"
+                )
+                results.append(self.transcribe(audio, language=language, task=task))
+                continue
+            results.append({
+                "text": text,
+                "language": decoded.language,
+                "segments": [{"start": 0.0, "end": round(len(audio) / SAMPLE_RATE, 2), "text": text}] if text else [],
+            })
+        return results
+
+    def iter_segments(self, audio: np.ndarray, language: Optional[str] = None,
+                      task: str = "transcribe") -> Tuple[str, Iterator[dict]]:
+        """Return the language and an iterator over segments.
+
+        openai-whisper only returns once the whole clip is decoded, so the
+        segments are all available together.
+        """
+        result = self.transcribe(audio, language=language, task=task)
+        return result["language"], iter(result["segments"])
+
+
+class FasterWhisperBackend:
+    """faster-whisper (CTranslate2) with quantized weights."""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size: str = "small", download_root: str = "models/whisper",
+                 device: str = "cpu", compute_type: str = "int8", cpu_threads: int = 0,
+                 beam_size: int = 1, verbose: bool = False):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise RuntimeError(
+                "ASR_BACKEND=faster-whisper requires the faster-whisper package (pip install faster-whisper)"
+            ) from e
+
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.beam_size = beam_size
+        self.verbose = verbose
+        self.model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            download_root=download_root,
+        )
+
+    def transcribe(self, audio: np.ndarray, language: Optional[str] = None, task: str = "transcribe",
+                   initial_prompt: Optional[str] = None, condition_on_previous_text: bool = True) -> dict:
+        segments, info = self.model.transcribe(
+            audio,
+            language=language,
+            task=task,
+            beam_size=self.beam_size,
+            initial_prompt=initial_prompt,
+            condition_on_previous_text=condition_on_previous_text
+        )
+        # Segments are produced lazily; decoding happens while iterating
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        if self.verbose:
+            for s in segments:
+                print(f"[{s['start']:.2f} --> {s['end']:.2f}] {s['text']}")
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "language": info.language,
+            "language_probability": info.language_probability,
+            "segments": segments,
+        }
+
+    def detect_language(self, audio: np.ndarray) -> Tuple[str, float]:
+        """Detect the spoken language from the first 30 s mel window."""
+        if hasattr(self.model, "detect_language"):
+            # faster-whisper >= 1.1
+            language, probability, _ = self.model.detect_language(audio)
+            return language, float(probability)
+        extractor = self.model.feature_extractor
+        features = extractor(audio[:extractor.n_samples])[:, :extractor.nb_max_frames]
+        encoder_output = self.model.encode(features)
+        token, probability = self.model.model.detect_language(encoder_output)[0][0]
+        return token[2:-2], float(probability)
+
+    def transcribe_batch(self, audios: List[np.ndarray], language: Optional[str] = None,
+                         task: str = "transcribe") -> List[dict]:
+        """Transcribe several clips back to back.
+
+        CTranslate2 already batches beams internally and the public
+        faster-whisper API takes one file at a time, so a batch here only
+        saves the per-request scheduling overhead.
+        """
+        return [self.transcribe(audio, language=language, task=task) for audio in audios]
+
+    def iter_segments(self, audio: np.ndarray, language: Optional[str] = None,
+                      task: str = "transcribe") -> Tuple[str, Iterator[dict]]:
+        """Return the language and an iterator that decodes segments as it is consumed."""
+        segments, info = self.model.transcribe(audio, language=language, task=task, beam_size=self.beam_size)
+        return info.language, ({"start": s.start, "end": s.end, "text": s.text} for s in segments)
+
+
+def load_asr_backend(download_root: str = "models/whisper"):
+    """Create the ASR backend selected by the environment.
+
+    ``ASR_BACKEND`` is ``whisper`` (default) or ``faster-whisper``;
+    ``ASR_MODEL_SIZE`` picks the checkpoint (default ``small``). For
+    faster-whisper, ``ASR_DEVICE``, ``ASR_COMPUTE_TYPE`` (default ``int8``),
+    ``ASR_CPU_THREADS`` and ``ASR_BEAM_SIZE`` tune the engine.
+    """
+    backend = os.environ.get("ASR_BACKEND", "whisper").lower()
+    model_size = os.environ.get("ASR_MODEL_SIZE", "small")
+    verbose = os.environ.get("ASR_VERBOSE", "false").lower() in ("true", "1", "yes")
+
+    if backend in ("faster-whisper", "faster_whisper", "ctranslate2"):
+        return FasterWhisperBackend(
+            model_size,
+            download_root=download_root,
+            device=os.environ.get("ASR_DEVICE", "cpu"),
+            compute_type=os.environ.get("ASR_COMPUTE_TYPE", "int8"),
+            cpu_threads=int(os.environ.get("ASR_CPU_THREADS", "0")),
+            beam_size=int(os.environ.get("ASR_BEAM_SIZE", "1")),
+            verbose=verbose,
+        )
+    if backend in ("whisper", "openai-whisper"):
+        return WhisperBackend(
+            model_size,
+            download_root=download_root,
+            device=os.environ.get("ASR_DEVICE") or None,
+            verbose=verbose,
+        )
+    raise ValueError(f"Unknown ASR_BACKEND '{backend}'. Use 'whisper' or 'faster-whisper'.")
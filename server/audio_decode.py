@@ -0,0 +1,71 @@
+"""In-memory audio decoding for Whisper.
+
+Uploaded audio is decoded straight into a 16 kHz mono float32 NumPy array,
+which Whisper accepts directly, so no temporary files are written. WAV and
+FLAC uploads already at 16 kHz are decoded in-process with soundfile;
+everything else (webm/Opus from the Flutter client, mp3, resampling) is
+piped through ffmpeg's stdin/stdout.
+"""
+import io
+import logging
+import subprocess
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+class AudioDecodeError(ValueError):
+    """Raised when uploaded audio cannot be decoded."""
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    """Convert little-endian signed 16-bit PCM to float32 in [-1, 1]."""
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def _decode_with_soundfile(data: bytes):
+    try:
+        audio, sample_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except RuntimeError:
+        # Not a format libsndfile understands (e.g. webm/Opus)
+        return None
+    if sample_rate != SAMPLE_RATE:
+        return None
+    return np.ascontiguousarray(audio.mean(axis=1), dtype=np.float32)
+
+
+def _decode_with_ffmpeg(data: bytes) -> np.ndarray:
+    cmd = [
+        'ffmpeg',
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-fflags', '+genpts',  # Generate presentation timestamps
+        '-i', 'pipe:0',
+        '-f', 'f32le',         # Raw float32 samples, as Whisper expects
+        '-ac', '1',            # Convert to mono
+        '-ar', str(SAMPLE_RATE),
+        'pipe:1'
+    ]
+    try:
+        result = subprocess.run(cmd, input=data, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(e.stderr.decode("utf-8", errors="replace").strip()) from e
+    return np.frombuffer(result.stdout, dtype="<f4").copy()
+
+
+def decode_audio(data: bytes) -> np.ndarray:
+    """Decode an uploaded audio file to 16 kHz mono float32 samples."""
+    if not data:
+        raise AudioDecodeError("Audio data is empty")
+
+    audio = _decode_with_soundfile(data)
+    if audio is None:
+        audio = _decode_with_ffmpeg(data)
+
+    if audio.size == 0:
+        raise AudioDecodeError("Decoded audio is empty")
+    return audio
@@ -0,0 +1,221 @@
+"""Dynamic micro-batching for model inference.
+
+Requests submit single items to a ``MicroBatcher`` and await the result.
+A background task collects items from concurrent callers for up to
+``max_wait_ms`` (or until ``max_batch_size`` items / ``max_batch_tokens``
+tokens are queued), runs one batch call per group and resolves each
+caller's future. At most ``max_queue`` items may wait at once; further
+submissions are rejected with ``PoolSaturatedError``. Up to
+``max_concurrent_batches`` groups run at the same time, so a slow group
+(say, one language pair) does not hold up the others.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Hashable, List, Optional, Set
+
+from inference_pool import PoolSaturatedError, ServiceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    __slots__ = ("item", "cost", "future")
+
+    def __init__(self, item: Any, cost: int, future: asyncio.Future):
+        self.item = item
+        self.cost = cost
+        self.future = future
+
+
+class MicroBatcher:
+    """Collect items from concurrent requests into batched calls.
+
+    ``process_batch`` receives a list of items that share the same group key
+    and must return one result per item, in order. It is a blocking function
+    and is run in ``executor`` so the event loop stays responsive. Given an
+    ``InferencePool`` as ``pool`` instead, each batch is submitted through
+    the pool, so it counts towards the pool's in-flight limit and stats and
+    a saturated pool fails the batch with ``PoolSaturatedError``.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        max_batch_tokens: int = 4096,
+        max_queue: int = 1024,
+        cost_fn: Optional[Callable[[Any], int]] = None,
+        group_key_fn: Optional[Callable[[Any], Hashable]] = None,
+        executor=None,
+        name: str = "batcher",
+        max_concurrent_batches: Optional[int] = None,
+        pool=None,
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_batch_tokens = max(1, max_batch_tokens)
+        self.max_queue = max(1, max_queue)
+        self.cost_fn = cost_fn or (lambda item: 1)
+        self.group_key_fn = group_key_fn or (lambda item: None)
+        self.executor = executor
+        self.name = name
+        self.pool = pool
+        if max_concurrent_batches is None:
+            max_concurrent_batches = pool.max_workers if pool is not None else 1
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._running: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.tokens = 0
+        self.fill_ratio_sum = 0.0
+        self.max_fill_ratio = 0.0
+        self.rejected = 0
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"{self.name}: started (max_batch_size={self.max_batch_size}, "
+                f"max_wait_ms={self.max_wait * 1000:.0f}, max_batch_tokens={self.max_batch_tokens})"
+            )
+
+    async def stop(self):
+        """Stop collecting and fail every queued or running item."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for task in list(self._running):
+            task.cancel()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+        error = ServiceUnavailableError(f"{self.name} is shutting down")
+        while self._queue is not None and not self._queue.empty():
+            pending = self._queue.get_nowait()
+            if not pending.future.done():
+                pending.future.set_exception(error)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result."""
+        if self._task is None:
+            await self.start()
+        if self._queue.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise PoolSaturatedError(self.name)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Pending(item, self.cost_fn(item), future))
+        return await future
+
+    async def _collect(self) -> List[_Pending]:
+        first = await self._queue.get()
+        batch = [first]
+        tokens = first.cost
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size and tokens < self.max_batch_tokens:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            batch.append(pending)
+            tokens += pending.cost
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+
+            groups = {}
+            for pending in batch:
+                if pending.future.cancelled():
+                    continue
+                groups.setdefault(self.group_key_fn(pending.item), []).append(pending)
+
+            for group in groups.values():
+                # Wait for a free slot; meanwhile new items queue up and
+                # form the next, fuller batch
+                await self._slots.acquire()
+                task = asyncio.create_task(self._run_group(group))
+                self._running.add(task)
+                task.add_done_callback(self._group_done)
+
+    def _group_done(self, task: asyncio.Task):
+        self._running.discard(task)
+        self._slots.release()
+
+    async def _run_group(self, group: List[_Pending]):
+        loop = asyncio.get_running_loop()
+        self._record(group)
+        items = [p.item for p in group]
+        try:
+            if self.pool is not None:
+                results = await self.pool.run(self.process_batch, items)
+            else:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            if len(results) != len(group):
+                raise RuntimeError(
+                    f"{self.name}: batch of {len(group)} items returned {len(results)} results"
+                )
+        except asyncio.CancelledError:
+            error = ServiceUnavailableError(f"{self.name} is shutting down")
+            for pending in group:
+                if not pending.future.done():
+                    pending.future.set_exception(error)
+            raise
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(group)} failed: {e}")
+            for pending in group:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        for pending, result in zip(group, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    def _record(self, group: List[_Pending]):
+        fill_ratio = len(group) / self.max_batch_size
+        self.batches += 1
+        self.items += len(group)
+        self.tokens += sum(p.cost for p in group)
+        self.fill_ratio_sum += fill_ratio
+        self.max_fill_ratio = max(self.max_fill_ratio, fill_ratio)
+
+    def stats(self) -> dict:
+        """Return batching counters, including the average batch fill ratio."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "tokens": self.tokens,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "avg_fill_ratio": self.fill_ratio_sum / self.batches if self.batches else 0.0,
+            "max_fill_ratio": self.max_fill_ratio,
+            "rejected": self.rejected,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch_tokens": self.max_batch_tokens,
+            "max_queue": self.max_queue,
+            "running_batches": len(self._running),
+            "max_concurrent_batches": self.max_concurrent_batches,
+        }
@@ -0,0 +1,154 @@
+"""Length- and latency-aware decoding policy for the translation model.
+
+Instead of word-count thresholds buried in the handler, the translator asks
+a ``DecodingPolicySelector`` for the beam size, token budget and chunk size
+to use. The choice depends on the source length in tokens and, optionally,
+on a per-request latency budget: when the estimated decoding cost exceeds
+the budget the selector drops to greedy search and then caps the number of
+new tokens, but never below ``min_length_ratio * source_tokens`` so a
+tight budget cannot silently cut off the translation of a long chunk.
+
+All settings can be overridden from the environment:
+
+* ``DECODING_TIER_TOKENS`` - source-length tier bounds, e.g. ``"6,10"``
+* ``DECODING_TIER_BEAMS`` - beams per tier, one more entry than the bounds
+* ``DECODING_LENGTH_RATIO`` / ``DECODING_LENGTH_SLACK`` - max new tokens is
+  ``ratio * source_tokens + slack`` ...
+* ``DECODING_MAX_NEW_TOKENS`` - ... capped at this value
+* ``DECODING_MIN_LENGTH_RATIO`` - a latency budget never caps max new
+  tokens below ``ratio * source_tokens``
+* ``DECODING_CHUNK_WORDS`` - words per chunk for long inputs
+* ``DECODING_MS_PER_TOKEN`` - estimated cost of one decoder step per beam
+"""
+import math
+import os
+from typing import List, Optional, Tuple
+
+
+def _env_ints(name: str, default: str) -> List[int]:
+    return [int(v) for v in os.environ.get(name, default).split(",") if v.strip()]
+
+
+class DecodingPolicy:
+    """Generation settings for one chunk (or a bucket of similar chunks)."""
+
+    __slots__ = ("num_beams", "max_new_tokens", "estimated_ms", "degraded")
+
+    def __init__(self, num_beams: int, max_new_tokens: int, estimated_ms: float, degraded: bool = False):
+        self.num_beams = num_beams
+        self.max_new_tokens = max_new_tokens
+        self.estimated_ms = estimated_ms
+        # True when a latency budget lowered the beams or the length cap;
+        # such output is not what an unbudgeted request would get
+        self.degraded = degraded
+
+    def key(self) -> Tuple[int]:
+        """Chunks with the same key can share one generate call.
+
+        Only the beam count has to match; the shared call uses the largest
+        ``max_new_tokens`` of its chunks (see ``DecodingPolicySelector.merge``).
+        """
+        return (self.num_beams,)
+
+    def generation_kwargs(self) -> dict:
+        kwargs = {
+            "num_beams": self.num_beams,
+            "max_new_tokens": self.max_new_tokens,
+            "min_length": 1,
+            "do_sample": False,
+            "repetition_penalty": 1.2,
+            "no_repeat_ngram_size": 2,
+        }
+        if self.num_beams > 1:
+            kwargs["length_penalty"] = 1.0
+            kwargs["early_stopping"] = True
+        return kwargs
+
+    def describe(self) -> str:
+        return f"beams={self.num_beams} max_new_tokens={self.max_new_tokens} est={self.estimated_ms:.0f}ms"
+
+
+class DecodingPolicySelector:
+    """Chooses decoding settings from source length and latency budget."""
+
+    def __init__(
+        self,
+        tier_tokens: Optional[List[int]] = None,
+        tier_beams: Optional[List[int]] = None,
+        length_ratio: float = 2.0,
+        length_slack: int = 8,
+        max_new_tokens: int = 128,
+        min_new_tokens: int = 8,
+        min_length_ratio: float = 1.5,
+        chunk_words: int = 15,
+        ms_per_token: float = 6.0,
+    ):
+        self.tier_tokens = tier_tokens if tier_tokens is not None else [6, 10]
+        self.tier_beams = tier_beams if tier_beams is not None else [1, 1, 2]
+        if len(self.tier_beams) != len(self.tier_tokens) + 1:
+            raise ValueError("Need exactly one more beam setting than tier bounds")
+        self.length_ratio = length_ratio
+        self.length_slack = length_slack
+        self.max_new_tokens = max_new_tokens
+        self.min_new_tokens = min_new_tokens
+        self.min_length_ratio = min_length_ratio
+        self.chunk_words = chunk_words
+        self.ms_per_token = ms_per_token
+
+    @classmethod
+    def from_env(cls) -> "DecodingPolicySelector":
+        return cls(
+            tier_tokens=_env_ints("DECODING_TIER_TOKENS", "6,10"),
+            tier_beams=_env_ints("DECODING_TIER_BEAMS", "1,1,2"),
+            length_ratio=float(os.environ.get("DECODING_LENGTH_RATIO", "2.0")),
+            length_slack=int(os.environ.get("DECODING_LENGTH_SLACK", "8")),
+            max_new_tokens=int(os.environ.get("DECODING_MAX_NEW_TOKENS", "128")),
+            min_length_ratio=float(os.environ.get("DECODING_MIN_LENGTH_RATIO", "1.5")),
+            chunk_words=int(os.environ.get("DECODING_CHUNK_WORDS", "15")),
+            ms_per_token=float(os.environ.get("DECODING_MS_PER_TOKEN", "6.0")),
+        )
+
+    def estimate_ms(self, num_beams: int, max_new_tokens: int) -> float:
+        """Worst-case decoding cost, assuming every step is taken."""
+        return self.ms_per_token * num_beams * max_new_tokens
+
+    def choose(self, source_tokens: int, latency_budget_ms: Optional[float] = None) -> DecodingPolicy:
+        tier = sum(source_tokens > bound for bound in self.tier_tokens)
+        num_beams = self.tier_beams[tier]
+        max_new_tokens = min(
+            self.max_new_tokens,
+            max(self.min_new_tokens, math.ceil(self.length_ratio * source_tokens) + self.length_slack),
+        )
+        full_quality = (num_beams, max_new_tokens)
+
+        if latency_budget_ms is not None:
+            # Beam search is the first thing to go, then the output length
+            if self.estimate_ms(num_beams, max_new_tokens) > latency_budget_ms:
+                num_beams = 1
+            # Short budgets trade latency, not content: the cap scales with
+            # the source so long chunks still have room for a full output
+            floor = max(self.min_new_tokens, math.ceil(self.min_length_ratio * source_tokens))
+            affordable = int(latency_budget_ms / self.ms_per_token)
+            if affordable < max_new_tokens:
+                max_new_tokens = min(max_new_tokens, max(floor, affordable))
+
+        return DecodingPolicy(
+            num_beams, max_new_tokens, self.estimate_ms(num_beams, max_new_tokens),
+            degraded=(num_beams, max_new_tokens) != full_quality,
+        )
+
+    def merge(self, policies: List[DecodingPolicy]) -> DecodingPolicy:
+        """One policy for chunks sharing a ``key``, sized for the longest of them."""
+        num_beams = policies[0].num_beams
+        max_new_tokens = max(policy.max_new_tokens for policy in policies)
+        return DecodingPolicy(
+            num_beams, max_new_tokens, self.estimate_ms(num_beams, max_new_tokens),
+            degraded=any(policy.degraded for policy in policies),
+        )
+
+    def chunk_words_for(self, latency_budget_ms: Optional[float] = None) -> int:
+        """Words per chunk; tight budgets use smaller chunks that batch together."""
+        if latency_budget_ms is None:
+            return self.chunk_words
+        words_in_budget = int(latency_budget_ms / (self.ms_per_token * self.length_ratio * 1.5))
+        return max(5, min(self.chunk_words, words_in_budget))
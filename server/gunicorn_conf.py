@@ -0,0 +1,50 @@
+"""Gunicorn settings for running several workers that share model weights.
+
+uvicorn's own ``--workers`` spawns fresh interpreters, so every worker
+loads its own copy of Whisper and IndicTrans. With this config gunicorn
+imports ``main`` once in the master (``preload_app``), loading every model
+eagerly, and then forks the uvicorn workers. The weights are inherited
+copy-on-write, so memory no longer grows with the worker count as long as
+the workers only read them.
+
+    cd server && gunicorn -c gunicorn_conf.py main:app
+
+Settings: ``WEB_CONCURRENCY`` (workers, default 4), ``BIND``
+(default 0.0.0.0:8001) and ``MT_INTRA_OP_THREADS`` (torch threads per
+worker, default CPU count divided by the worker count).
+"""
+import gc
+import os
+
+# Load every model in the master before forking; lazy or background loading
+# would happen after the fork and give each worker a private copy again
+os.environ["MODEL_LOAD_MODE"] = "eager"
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Loading the models dominates startup, not the workers
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+
+
+def when_ready(server):
+    import torch
+
+    if torch.cuda.is_available():
+        server.log.warning(
+            "CUDA is available: CUDA contexts cannot be shared across fork(), "
+            "run a single worker per GPU instead of preloading"
+        )
+    # Move everything allocated while loading into the permanent generation so
+    # the cyclic GC never writes to those object headers in the workers
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import torch
+
+    # Split the cores between workers instead of letting each one claim all of them
+    threads = int(os.environ.get("MT_INTRA_OP_THREADS", "0")) or max(1, (os.cpu_count() or 1) // workers)
+    torch.set_num_threads(threads)
+    server.log.info(f"Worker {worker.pid} using {threads} torch threads")
@@ -0,0 +1,106 @@
+"""Bounded worker pools that keep blocking inference off the event loop.
+
+Each model family (ASR, MT, TTS) gets its own ``InferencePool`` so a slow
+Whisper job cannot starve translation or health checks. A pool accepts at
+most ``max_workers + max_queue`` jobs; anything beyond that is rejected
+with ``PoolSaturatedError`` so the API can answer 503 with Retry-After
+instead of queueing without bound.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceUnavailableError(Exception):
+    """Base class for errors answered with 503 and a Retry-After header."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PoolSaturatedError(ServiceUnavailableError):
+    """Raised when a pool has no free worker or queue slot."""
+
+    def __init__(self, pool_name: str, retry_after: int = 1):
+        super().__init__(f"{pool_name} inference pool is busy, retry later", retry_after)
+        self.pool_name = pool_name
+
+
+class InferencePool:
+    """A thread pool with a bounded number of running plus queued jobs.
+
+    Threads are used rather than processes because torch, CTranslate2 and
+    ffmpeg release the GIL during the heavy work, and the models can stay
+    loaded once per process.
+    """
+
+    def __init__(self, name: str, max_workers: int = 1, max_queue: int = 8, retry_after: int = 1):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=f"{name}-worker"
+        )
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        # Metrics
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PoolSaturatedError(self.name, self.retry_after)
+            self._in_flight += 1
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """Submit a job, raising ``PoolSaturatedError`` if the pool is full."""
+        self._acquire()
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        # Release the slot when the job really finishes, even if the caller
+        # stopped waiting for it
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking function in the pool and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.max_workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
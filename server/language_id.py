@@ -0,0 +1,88 @@
+"""Spoken language identification cached per client session.
+
+Whisper detects the language from the first 30 s mel window, which costs
+an encoder pass. Most sessions stay in one language, so the result is
+kept per session ID for ``ttl_seconds`` and later clips from the same
+session reuse it. Detections below ``min_confidence`` are returned but not
+cached, so the next clip gets another try.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class LanguageSessionCache:
+    """TTL-bounded ``session_id -> (language, confidence)`` map."""
+
+    def __init__(self, ttl_seconds: float = 1800.0, max_sessions: int = 10000, min_confidence: float = 0.5):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.min_confidence = min_confidence
+        self._entries: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.detections = 0
+        self.detection_seconds = 0.0
+
+    def get(self, session_id: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    del self._entries[session_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, session_id: str, language: str, confidence: float):
+        if confidence < self.min_confidence:
+            return
+        with self._lock:
+            self._entries[session_id] = (language, confidence, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def resolve(self, session_id: Optional[str], detect) -> dict:
+        """Return the session's language, running ``detect()`` on a miss.
+
+        ``detect`` returns ``(language, confidence)``. The result dict holds
+        ``language``, ``confidence``, ``detection_ms`` and ``source``
+        (``session`` or ``detected``).
+        """
+        if session_id:
+            cached = self.get(session_id)
+            if cached is not None:
+                return {"language": cached[0], "confidence": round(cached[1], 4), "detection_ms": 0, "source": "session"}
+
+        start = time.time()
+        language, confidence = detect()
+        seconds = time.time() - start
+        with self._lock:
+            self.detections += 1
+            self.detection_seconds += seconds
+        if session_id:
+            self.put(session_id, language, confidence)
+        return {
+            "language": language,
+            "confidence": round(confidence, 4),
+            "detection_ms": round(seconds * 1000),
+            "source": "detected",
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "detections": self.detections,
+                "avg_detection_ms": round(self.detection_seconds / self.detections * 1000, 1) if self.detections else 0.0,
+                "ttl_seconds": self.ttl_seconds,
+            }
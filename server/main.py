@@ -1,26 +1,43 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
-from pydantic import BaseModel
-from typing import Optional, List
-import whisper
-import tempfile
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional, List, Tuple
 import os
-import subprocess
 import torch
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, TextIteratorStreamer
 from pathlib import Path
-from functools import lru_cache
 import time
 import uuid
 import socket
 import re
+import math
+import base64
+import json
+import asyncio
 import soundfile as sf
 import numpy as np
 import logging
 import shutil
-import gtts
-from gtts import gTTS
+
+from batching import MicroBatcher
+from decoding_policy import DecodingPolicy, DecodingPolicySelector
+from mt_cpu import configure_threads, prepare_cpu_model
+from language_id import LanguageSessionCache
+from inference_pool import InferencePool, PoolSaturatedError, ServiceUnavailableError
+from model_registry import ModelRegistry
+from asr_backends import MAX_BATCH_SECONDS, load_asr_backend
+from audio_decode import SAMPLE_RATE, AudioDecodeError, decode_audio
+from streaming_asr import RollingAudioBuffer, create_stream_decoder
+from vad import trim_silence
+from phrasebook import Phrasebook
+from http_ranges import file_response
+from tts_backends import (
+    AUDIO_MEDIA_TYPES, LANGUAGE_NAMES, concat_audio, load_tts_router, read_mp3_frames, read_wav_pcm,
+    streaming_wav_header, synthesize_as
+)
+from tts_cache import TTSCache, make_tts_key
+from translation_cache import PersistentTranslationStore, TranslationCache, model_revision
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -50,14 +67,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load Whisper model
-print("Loading Whisper model...")
-try:
-    model = whisper.load_model("small", download_root="models/whisper")
-    print("Successfully loaded Whisper model")
-except Exception as e:
-    print(f"Error loading Whisper model: {e}")
-    raise
+# Separate bounded worker pools so blocking ASR, MT and TTS work never runs
+# on the event loop and one slow job cannot stall the other services
+asr_pool = InferencePool(
+    "asr",
+    max_workers=int(os.environ.get("ASR_WORKERS", "1")),
+    max_queue=int(os.environ.get("ASR_MAX_QUEUE", "4")),
+    retry_after=int(os.environ.get("ASR_RETRY_AFTER", "2")),
+)
+mt_pool = InferencePool(
+    "mt",
+    max_workers=int(os.environ.get("MT_WORKERS", "1")),
+    max_queue=int(os.environ.get("MT_MAX_QUEUE", "16")),
+    retry_after=int(os.environ.get("MT_RETRY_AFTER", "1")),
+)
+tts_pool = InferencePool(
+    "tts",
+    max_workers=int(os.environ.get("TTS_WORKERS", "2")),
+    max_queue=int(os.environ.get("TTS_MAX_QUEUE", "8")),
+    retry_after=int(os.environ.get("TTS_RETRY_AFTER", "1")),
+)
+
+@app.exception_handler(ServiceUnavailableError)
+async def service_unavailable_handler(request: Request, exc: ServiceUnavailableError):
+    """Apply backpressure when an inference pool is full or a model is still loading"""
+    logger.warning(f"Rejecting {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Models are registered here and loaded by the registry (see the end of this file)
+MODEL_LOAD_MODE = os.environ.get("MODEL_LOAD_MODE", "background").lower()
+LAZY_MODELS = {name.strip() for name in os.environ.get("LAZY_MODELS", "").split(",") if name.strip()}
+model_registry = ModelRegistry(
+    wait_timeout=float(os.environ.get("MODEL_WAIT_TIMEOUT", "60")),
+    retry_after=int(os.environ.get("MODEL_RETRY_AFTER", "5")),
+    retry_backoff=float(os.environ.get("MODEL_RETRY_BACKOFF", "5")),
+    max_retry_backoff=float(os.environ.get("MODEL_MAX_RETRY_BACKOFF", "300")),
+    max_attempts=int(os.environ.get("MODEL_MAX_ATTEMPTS", "0")),
+)
 
 # Define model paths
 MODEL_DIR = Path("models")
@@ -76,8 +126,35 @@ indic_en_dir.mkdir(exist_ok=True)
 m2m_dir = MODEL_DIR / "m2m"
 m2m_dir.mkdir(exist_ok=True)
 
-# Add translation cache
-translation_cache = {}
+# Optional SQLite tier shared by all workers and kept across restarts
+TRANSLATION_CACHE_PERSIST = os.environ.get("TRANSLATION_CACHE_PERSIST", "false").lower() in ("true", "1", "yes")
+translation_store = None
+if TRANSLATION_CACHE_PERSIST:
+    translation_store = PersistentTranslationStore(
+        Path(os.environ.get("TRANSLATION_CACHE_DB", str(MODEL_DIR / "translation_cache.sqlite3"))),
+        # Without an explicit revision it is derived once the model has loaded
+        revision=os.environ.get("TRANSLATION_MODEL_REVISION"),
+    )
+    print(f"Using persistent translation cache at {translation_store.path}")
+
+# Bounded LRU cache shared by whole requests and chunks
+translation_cache = TranslationCache(
+    max_entries=int(os.environ.get("TRANSLATION_CACHE_MAX_ENTRIES", "20000")),
+    max_bytes=int(os.environ.get("TRANSLATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    store=translation_store,
+)
+
+# Content-addressed cache of synthesized speech
+tts_cache = TTSCache(
+    Path(os.environ.get("TTS_CACHE_DIR", str(MODEL_DIR / "tts_cache"))),
+    max_bytes=int(os.environ.get("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+    max_entries=int(os.environ.get("TTS_CACHE_MAX_ENTRIES", "20000")),
+)
+
+# Precompiled phrase index consulted before the cache and the model
+PHRASEBOOK_PATH = Path(os.environ.get("PHRASEBOOK_PATH", str(Path(__file__).parent / "data" / "phrasebook.json")))
+phrasebook = Phrasebook.from_file(PHRASEBOOK_PATH)
+print(f"Loaded phrasebook with {len(phrasebook)} phrases from {PHRASEBOOK_PATH}")
 
 # Configure offline mode
 OFFLINE_MODE = os.environ.get("OFFLINE_MODE", "false").lower() in ("true", "1", "yes")
@@ -111,57 +188,70 @@ models = {
     }
 }
 
-print("\nLoading translation models...")
+print("\nConfiguring translation models...")
 device = "cuda" if torch.cuda.is_available() else "cpu"
 print(f"Using device: {device}")
+if device == "cpu":
+    configure_threads()
 
-# Initialize model variables
-en_indic_model = None
-en_indic_tokenizer = None
-
-# Load AI4Bharat model
-print("Loading AI4Bharat model...")
-try:
-    # First try to load from local directory
-    en_indic_tokenizer, en_indic_model = load_model_offline(
-        en_indic_dir,
-        "ai4bharat/IndicTrans-v2"
-    )
+def load_whisper_model():
+    """Load the configured Whisper backend"""
+    try:
+        backend = load_asr_backend(download_root="models/whisper")
+        print(f"Successfully loaded Whisper model ({backend.name}, {backend.model_size})")
+        return backend
+    except Exception as e:
+        print(f"Error loading Whisper model: {e}")
+        raise
 
-    # If local loading fails, try downloading
-    if not en_indic_model or not en_indic_tokenizer:
-        print("Local model loading failed, attempting to download...")
-        en_indic_tokenizer = AutoTokenizer.from_pretrained("ai4bharat/IndicTrans-v2")
-        en_indic_model = AutoModelForSeq2SeqLM.from_pretrained("ai4bharat/IndicTrans-v2")
-        
-        # Save the model locally
-        en_indic_tokenizer.save_pretrained(en_indic_dir)
-        en_indic_model.save_pretrained(en_indic_dir)
-        print("Model downloaded and saved locally")
-
-    if en_indic_model and en_indic_tokenizer:
-        en_indic_model = en_indic_model.to(device)
-        en_indic_model.eval()
-        print("Successfully loaded AI4Bharat model")
-        
-        # Test the model with a simple translation
-        test_input = "Hello"
-        test_output = en_indic_tokenizer.decode(
-            en_indic_model.generate(
-                **en_indic_tokenizer(test_input, return_tensors="pt").to(device),
-                forced_bos_token_id=en_indic_tokenizer.lang_code_to_id["hi"]
-            )[0],
-            skip_special_tokens=True
+def load_translation_model():
+    """Load the AI4Bharat model and return (tokenizer, model)"""
+    print("Loading AI4Bharat model...")
+    try:
+        # First try to load from local directory
+        en_indic_tokenizer, en_indic_model = load_model_offline(
+            en_indic_dir,
+            "ai4bharat/IndicTrans-v2"
         )
-        print(f"Model test translation: {test_input} -> {test_output}")
-    else:
-        print("Failed to load AI4Bharat model")
-        raise RuntimeError("Failed to initialize translation model")
-except Exception as e:
-    print(f"Error loading AI4Bharat model: {e}")
-    en_indic_model = None
-    en_indic_tokenizer = None
-    raise  # Re-raise the exception to prevent the server from starting with a broken model
+
+        # If local loading fails, try downloading
+        if not en_indic_model or not en_indic_tokenizer:
+            print("Local model loading failed, attempting to download...")
+            en_indic_tokenizer = AutoTokenizer.from_pretrained("ai4bharat/IndicTrans-v2")
+            en_indic_model = AutoModelForSeq2SeqLM.from_pretrained("ai4bharat/IndicTrans-v2")
+            
+            # Save the model locally
+            en_indic_tokenizer.save_pretrained(en_indic_dir)
+            en_indic_model.save_pretrained(en_indic_dir)
+            print("Model downloaded and saved locally")
+
+        if en_indic_model and en_indic_tokenizer:
+            en_indic_model = en_indic_model.to(device)
+            en_indic_model.eval()
+            if device == "cpu":
+                en_indic_model = prepare_cpu_model(en_indic_model, en_indic_tokenizer)
+            print("Successfully loaded AI4Bharat model")
+            if translation_store is not None and not os.environ.get("TRANSLATION_MODEL_REVISION"):
+                # The config files exist now that the model is downloaded
+                translation_store.set_revision(model_revision(en_indic_dir))
+            
+            # Test the model with a simple translation
+            test_input = "Hello"
+            test_output = en_indic_tokenizer.decode(
+                en_indic_model.generate(
+                    **en_indic_tokenizer(test_input, return_tensors="pt").to(device),
+                    forced_bos_token_id=en_indic_tokenizer.lang_code_to_id["hi"]
+                )[0],
+                skip_special_tokens=True
+            )
+            print(f"Model test translation: {test_input} -> {test_output}")
+            return en_indic_tokenizer, en_indic_model
+        else:
+            print("Failed to load AI4Bharat model")
+            raise RuntimeError("Failed to initialize translation model")
+    except Exception as e:
+        print(f"Error loading AI4Bharat model: {e}")
+        raise  # Re-raise so the registry reports the model as failed
 
 def get_indic_language_code(lang_code: str) -> str:
     """Convert language code to AI4Bharat format."""
@@ -202,239 +292,263 @@ class TranslationRequest(BaseModel):
     text: str
     source_lang: str
     target_lang: str
+    latency_budget_ms: Optional[float] = None  # Trade quality for speed when set
 
 class TranslationBatchRequest(BaseModel):
     texts: List[str]
     source_lang: str
     target_lang: str
+    latency_budget_ms: Optional[float] = None
 
 class TranslationResponse(BaseModel):
     translated_text: str
     mode: str = "offline"  # Always offline
     error: Optional[str] = None
 
-@lru_cache(maxsize=5000)
-def cached_translate(text: str, source_lang: str, target_lang: str) -> str:
-    """Cache translation results for faster repeated translations"""
-    import hashlib
-    # Always use hash for cache key to ensure consistency
-    text_hash = hashlib.md5(text.encode()).hexdigest()
-    key = f"{text_hash}_{source_lang}_{target_lang}"
-    print(f"Checking cache for: '{text[:20]}...' [{len(translation_cache)} items in cache]")
-    return translation_cache.get(key)
+# Chooses beams, output length and chunk size from source length and latency budget
+decoding_policy = DecodingPolicySelector.from_env()
 
-@app.post("/translate/")
-async def translate(request: TranslationRequest):
-    try:
-        if not en_indic_model or not en_indic_tokenizer:
-            raise HTTPException(status_code=500, detail="Translation model not available. Please ensure models are downloaded for offline use.")
+# Source chunks are truncated to this many tokens
+MAX_SOURCE_TOKENS = int(os.environ.get("MAX_SOURCE_TOKENS", "256"))
 
-        start_time = time.time()
-        print(f"Input text: {request.text}")
-        
-        # Check cache first
-        cached_result = cached_translate(request.text, request.source_lang, request.target_lang)
-        if cached_result:
-            print(f"Cache hit! Translation time: {time.time() - start_time:.2f}s")
-            return TranslationResponse(translated_text=cached_result)
+# Upper bound on the number of chunks sent to a single generate call
+TRANSLATE_BATCH_SIZE = int(os.environ.get("TRANSLATE_BATCH_SIZE", "32"))
 
-        source_lang = get_indic_language_code(request.source_lang)
-        target_lang = get_indic_language_code(request.target_lang)
-        
-        print(f"Translating from {source_lang} to {target_lang} using locally loaded model (offline mode)")
+def prepare_input_text(text: str) -> str:
+    """Add a period if the text doesn't end with sentence-ending punctuation"""
+    if not text[-1] in ['.', '?', '!'] and len(text) > 2:
+        return text + '.'
+    return text
 
-        # Format input text (simplified format)
-        input_text = request.text
-        
-        # Add period if the text doesn't end with sentence-ending punctuation
-        if not input_text[-1] in ['.', '?', '!'] and len(input_text) > 2:
-            input_text = input_text + '.'
-            
-        print(f"Formatted input: {input_text}")
-        
-        # Split long texts into sentences for faster processing
-        sentences = []
-        if len(input_text.split()) > 15:  # If text has more than 15 words
-            # Simple sentence splitting based on punctuation
-            import re
-            potential_sentences = re.split(r'(?<=[.!?])\s+', input_text)
-            
-            # Process each sentence or create chunks of reasonable size
-            for sent in potential_sentences:
-                if len(sent.split()) <= 15:
-                    sentences.append(sent)
+def split_into_chunks(input_text: str, max_words: Optional[int] = None) -> List[str]:
+    """Split long texts into sentences or comma-separated chunks of reasonable size"""
+    max_words = max_words or decoding_policy.chunk_words
+    if len(input_text.split()) <= max_words:
+        return [input_text]
+
+    sentences = []
+    # Simple sentence splitting based on punctuation
+    potential_sentences = re.split(r'(?<=[.!?])\s+', input_text)
+
+    # Process each sentence or create chunks of reasonable size
+    for sent in potential_sentences:
+        if len(sent.split()) <= max_words:
+            sentences.append(sent)
+        else:
+            # Further split long sentences by commas if needed
+            comma_splits = sent.split(', ')
+            current_chunk = ""
+            for split in comma_splits:
+                if len(current_chunk.split()) + len(split.split()) <= max_words:
+                    if current_chunk:
+                        current_chunk += ", " + split
+                    else:
+                        current_chunk = split
                 else:
-                    # Further split long sentences by commas if needed
-                    comma_splits = sent.split(', ')
-                    current_chunk = ""
-                    for split in comma_splits:
-                        if len(current_chunk.split()) + len(split.split()) <= 15:
-                            if current_chunk:
-                                current_chunk += ", " + split
-                            else:
-                                current_chunk = split
-                        else:
-                            if current_chunk:
-                                sentences.append(current_chunk)
-                            current_chunk = split
                     if current_chunk:
                         sentences.append(current_chunk)
-            
-            print(f"Split into {len(sentences)} chunks for faster processing")
-        else:
-            sentences = [input_text]
-            
-        # Process each sentence and combine the results
-        all_translations = []
-        
-        for i, sentence in enumerate(sentences):
-            print(f"Translating chunk {i+1}/{len(sentences)}")
-            word_count = len(sentence.split())
-            is_short_text = word_count < 5
-            is_very_short_text = word_count < 3
-            
-            # Check cache first for this sentence
-            import hashlib
-            text_hash = hashlib.md5(sentence.encode()).hexdigest()
-            cache_key = f"{text_hash}_{source_lang}_{target_lang}"
-            cached_result = translation_cache.get(cache_key)
-            if cached_result:
-                print(f"Cache hit for chunk {i+1}")
-                all_translations.append(cached_result)
-                continue
-            
-            # For very short texts (7 words or less), try ultra-simple translation first
-            if word_count <= 7 and source_lang == "en" and target_lang == "hi":
-                simple_result = simple_translate(sentence, source_lang, target_lang)
-                if simple_result:
-                    print(f"Used simple dictionary translation for chunk {i+1}")
-                    translation_cache[cache_key] = simple_result
-                    all_translations.append(simple_result)
-                    continue
-            
-            # Ultra-fast path for very short inputs (3 words or less) for basic greetings/phrases
-            if word_count <= 3 and target_lang == 'hi':
-                # Common English to Hindi translations for very short phrases
-                common_translations = {
-                    'hello': 'नमस्ते',
-                    'hi': 'नमस्ते',
-                    'hello.': 'नमस्ते।',
-                    'hi.': 'नमस्ते।',
-                    'how are you': 'आप कैसे हैं',
-                    'how are you?': 'आप कैसे हैं?',
-                    'good morning': 'सुप्रभात',
-                    'good morning.': 'सुप्रभात।',
-                    'good afternoon': 'शुभ दोपहर',
-                    'good afternoon.': 'शुभ दोपहर।',
-                    'good evening': 'शुभ संध्या',
-                    'good evening.': 'शुभ संध्या।',
-                    'good night': 'शुभ रात्रि',
-                    'good night.': 'शुभ रात्रि।',
-                    'thank you': 'धन्यवाद',
-                    'thank you.': 'धन्यवाद।',
-                    'thanks': 'धन्यवाद',
-                    'thanks.': 'धन्यवाद।',
-                    'yes': 'हाँ',
-                    'yes.': 'हां।',
-                    'no': 'नहीं',
-                    'no.': 'नहीं।',
-                    'goodbye': 'अलविदा',
-                    'goodbye.': 'अलविदा।',
-                    'bye': 'अलविदा',
-                    'bye.': 'अलविदा।',
-                    'hello world': 'हैलो दुनिया',
-                    'hello world.': 'हैलो दुनिया।'
-                }
-                
-                lower_input = sentence.lower()
-                if lower_input in common_translations:
-                    result = common_translations[lower_input]
-                    print(f"Using fast path translation: {result}")
-                    
-                    # Cache the result
-                    if len(sentence) > 100:
-                        import hashlib
-                        text_hash = hashlib.md5(sentence.encode()).hexdigest()
-                        cache_key = f"{text_hash}_{source_lang}_{target_lang}"
-                    else:
-                        cache_key = f"{sentence}_{source_lang}_{target_lang}"
-                        
-                    translation_cache[cache_key] = result
-                    all_translations.append(result)
-                    continue
-            
-            # Generate translation with performance-optimized parameters
-            translation_parameters = {
-                "max_length": 20 if is_very_short_text else (40 if is_short_text else 75),
-                "min_length": 1,
-                "num_beams": 1 if is_very_short_text else (1 if is_short_text else 2),  # More aggressive beam reduction
-                "length_penalty": 1.0,
-                "early_stopping": True,
-                "do_sample": False,
-                "temperature": 0.7,  # Add temperature for faster sampling
-                "top_k": 50,         # Add top_k for faster sampling
-                "repetition_penalty": 1.2,
-                "no_repeat_ngram_size": 2,
-                "forced_bos_token_id": en_indic_tokenizer.lang_code_to_id[target_lang]
-            }
-            
-            # Tokenize with performance-optimized settings
+                    current_chunk = split
+            if current_chunk:
+                sentences.append(current_chunk)
+
+    return sentences
+
+def lookup_chunk(sentence: str, source_lang: str, target_lang: str) -> Optional[str]:
+    """Return a translation for a chunk without running the model, or None"""
+    # Greetings and UI phrases come straight from the phrasebook
+    phrase_result = phrasebook.lookup(sentence, source_lang, target_lang)
+    if phrase_result:
+        return phrase_result
+
+    cached_result = translation_cache.get(sentence, source_lang, target_lang)
+    if cached_result:
+        return cached_result
+
+    return None
+
+def clean_translation_output(output_text: str, source_lang: str, target_lang: str) -> str:
+    """Strip language tags and quote characters left behind by the model"""
+    output_text = output_text.replace(f">>{target_lang}<<", "").strip()
+    output_text = output_text.replace(">> GG<", "").strip()
+    output_text = output_text.replace('"', '').strip()
+    output_text = output_text.replace("'", "").strip()
+    output_text = output_text.replace(source_lang, "").strip()
+    output_text = output_text.replace(target_lang, "").strip()
+    return output_text
+
+def plan_chunks(sentences: List[str], budget: Optional[float] = None) -> List[Tuple[int, DecodingPolicy]]:
+    """Source token count and decoding policy per chunk, tokenizing each chunk once"""
+    tokenizer = model_registry.get("mt")[0]
+    plans = []
+    for sentence in sentences:
+        source_tokens = len(tokenizer.tokenize(sentence))
+        plans.append((source_tokens, decoding_policy.choose(source_tokens, budget)))
+    return plans
+
+def generate_translations(
+    sentences: List[str],
+    source_lang: str,
+    target_lang: str,
+    plans: List[Tuple[int, DecodingPolicy]]
+) -> List[str]:
+    """Translate chunks with one padded generate call per beam setting.
+
+    ``plans`` holds ``(source_tokens, policy)`` for each chunk, as returned
+    by ``plan_chunks``. Chunks whose policies share a key (the beam count)
+    are sorted by length and batched together; each generate call uses the
+    largest length cap of its chunks. Results are cached and returned in
+    the same order as ``sentences``.
+    """
+    en_indic_tokenizer, en_indic_model = model_registry.get("mt")
+    results: List[Optional[str]] = [None] * len(sentences)
+
+    buckets = {}
+    for index, (source_tokens, policy) in enumerate(plans):
+        buckets.setdefault(policy.key(), []).append((source_tokens, index))
+
+    for entries in buckets.values():
+        # Sort by length so each generate call pads as little as possible
+        entries.sort()
+        indices = [index for _, index in entries]
+        for offset in range(0, len(indices), TRANSLATE_BATCH_SIZE):
+            batch_indices = indices[offset:offset + TRANSLATE_BATCH_SIZE]
+            batch = [sentences[i] for i in batch_indices]
+            policy = decoding_policy.merge([plans[i][1] for i in batch_indices])
+            batch_start = time.time()
+
+            # Tokenize the whole batch with padding
             inputs = en_indic_tokenizer(
-                sentence, 
-                return_tensors="pt", 
-                padding=True, 
-                truncation=True, 
-                max_length=translation_parameters["max_length"]  # Use consistent max_length
+                batch,
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=MAX_SOURCE_TOKENS
             ).to(device)
-            
-            # Generate translation with performance-optimized parameters
+
             with torch.no_grad():
                 translated = en_indic_model.generate(
                     **inputs,
-                    **translation_parameters
+                    **policy.generation_kwargs(),
+                    forced_bos_token_id=en_indic_tokenizer.lang_code_to_id[target_lang]
                 )
-            
-            # Decode the translation
-            output_text = en_indic_tokenizer.decode(translated[0], skip_special_tokens=True)
-            print(f"Raw translation: {output_text}")
-            
-            # Clean up the output text
-            output_text = output_text.replace(f">>{target_lang}<<", "").strip()
-            output_text = output_text.replace(">> GG<", "").strip()
-            output_text = output_text.replace('"', '').strip()
-            output_text = output_text.replace("'", "").strip()
-            output_text = output_text.replace(source_lang, "").strip()
-            output_text = output_text.replace(target_lang, "").strip()
-            
-            # Cache the result
-            if len(sentence) > 100:
-                import hashlib
-                text_hash = hashlib.md5(sentence.encode()).hexdigest()
-                cache_key = f"{text_hash}_{source_lang}_{target_lang}"
-            else:
-                cache_key = f"{sentence}_{source_lang}_{target_lang}"
-                
-            translation_cache[cache_key] = output_text
-            all_translations.append(output_text)
-            
-            print(f"Chunk {i+1} translated in {time.time() - start_time:.2f}s")
-            
-        # Combine translations
-        translated_text = " ".join(all_translations)
-        print(f"Complete translation time: {time.time() - start_time:.2f}s")
+
+            decoded = en_indic_tokenizer.batch_decode(translated, skip_special_tokens=True)
+            print(f"Generated {len(batch)} chunks with {policy.describe()} in {(time.time() - batch_start) * 1000:.0f}ms")
+
+            # Scatter the results back to their input positions
+            for index, sentence, output_text in zip(batch_indices, batch, decoded):
+                output_text = clean_translation_output(output_text, source_lang, target_lang)
+                # Output cut down by a latency budget is not cached; the key
+                # does not record the policy, so every later caller would get it
+                if not plans[index][1].degraded:
+                    translation_cache.put(sentence, source_lang, target_lang, output_text)
+                results[index] = output_text
+
+    return results
+
+def translate_chunks(
+    sentences: List[str], source_lang: str, target_lang: str, budget: Optional[float] = None
+) -> Tuple[List[str], List[bool]]:
+    """Plan and translate chunks in one blocking call; also returns which ones a budget degraded"""
+    plans = plan_chunks(sentences, budget)
+    return generate_translations(sentences, source_lang, target_lang, plans), [policy.degraded for _, policy in plans]
+
+def translate_chunk_group(items: List[tuple]) -> List[str]:
+    """Translate one batcher group; every item shares the same language pair.
+
+    Items are ``(sentence, source_lang, target_lang, source_tokens, policy)``.
+    """
+    _, source_lang, target_lang, _, _ = items[0]
+    return generate_translations(
+        [item[0] for item in items], source_lang, target_lang, [(item[3], item[4]) for item in items]
+    )
+
+# Collects chunks from concurrent /translate/ requests into padded generate calls
+translation_batcher = MicroBatcher(
+    translate_chunk_group,
+    max_batch_size=TRANSLATE_BATCH_SIZE,
+    max_wait_ms=float(os.environ.get("TRANSLATE_MAX_WAIT_MS", "10")),
+    max_batch_tokens=int(os.environ.get("TRANSLATE_MAX_BATCH_TOKENS", "2048")),
+    cost_fn=lambda item: item[3],
+    group_key_fn=lambda item: (item[1], item[2]),
+    max_queue=int(os.environ.get("TRANSLATE_MAX_QUEUE", "512")),
+    pool=mt_pool,
+    name="translation_batcher",
+)
+
+async def translate_text(text: str, source_lang: str, target_lang: str, budget: Optional[float] = None) -> str:
+    """Translate text between mapped language codes through the cache, phrasebook and batcher"""
+    start_time = time.time()
+
+    # Check cache first
+    cached_result = translation_cache.get(text, source_lang, target_lang)
+    if cached_result:
+        print(f"Cache hit! Translation time: {time.time() - start_time:.2f}s")
+        return cached_result
+    
+    print(f"Translating from {source_lang} to {target_lang} using locally loaded model (offline mode)")
+
+    # Format input text (simplified format)
+    input_text = prepare_input_text(text)
+    print(f"Formatted input: {input_text}")
+    
+    # Split long texts into sentences for faster processing
+    chunk_words = decoding_policy.chunk_words_for(budget)
+    sentences = split_into_chunks(input_text, chunk_words)
+    if len(sentences) > 1:
+        print(f"Split into {len(sentences)} chunks for faster processing")
+
+    # Resolve cached and fast-path chunks first
+    all_translations = [lookup_chunk(sentence, source_lang, target_lang) for sentence in sentences]
+    pending = [i for i, result in enumerate(all_translations) if result is None]
+    if len(pending) < len(sentences):
+        print(f"Fast path hit for {len(sentences) - len(pending)}/{len(sentences)} chunks")
+
+    # Each uncached chunk is tokenized once here; its token count and policy
+    # travel with it to the worker
+    plans = plan_chunks([sentences[i] for i in pending], budget)
+    estimated_ms = max((policy.estimated_ms for _, policy in plans), default=0.0)
+    if plans:
+        longest_tokens, policy = max(plans, key=lambda plan: plan[0])
+        print(f"Decoding policy: {len(pending)} chunks of <= {chunk_words} words, "
+              f"longest {longest_tokens} tokens, {policy.describe()}, budget={budget}")
+
+    # Dispatch every uncached chunk at once so the batcher can put them in
+    # the same padded generate call, then merge the results back by index
+    generated = await asyncio.gather(*(
+        translation_batcher.submit((sentences[i], source_lang, target_lang, source_tokens, policy))
+        for i, (source_tokens, policy) in zip(pending, plans)
+    ))
+    for i, output_text in zip(pending, generated):
+        all_translations[i] = output_text
+    if pending:
+        print(f"Translated {len(pending)} chunks in {time.time() - start_time:.2f}s")
         
-        # Cache the combined result
-        if len(request.text) > 100:
-            import hashlib
-            text_hash = hashlib.md5(request.text.encode()).hexdigest()
-            cache_key = f"{text_hash}_{source_lang}_{target_lang}"
-        else:
-            cache_key = f"{request.text}_{source_lang}_{target_lang}"
-            
-        translation_cache[cache_key] = translated_text
+    # Combine translations
+    translated_text = " ".join(all_translations)
+    print(f"Complete translation time: {time.time() - start_time:.2f}s "
+          f"(estimated {estimated_ms:.0f}ms, budget={budget})")
+    
+    # Cache the combined result unless a budget degraded any of its chunks
+    if not any(policy.degraded for _, policy in plans):
+        translation_cache.put(text, source_lang, target_lang, translated_text)
+    return translated_text
+
+@app.post("/translate/")
+async def translate(request: TranslationRequest):
+    try:
+        await model_registry.acquire("mt")
+
+        print(f"Input text: {request.text}")
         
+        source_lang = get_indic_language_code(request.source_lang)
+        target_lang = get_indic_language_code(request.target_lang)
+
+        translated_text = await translate_text(request.text, source_lang, target_lang, request.latency_budget_ms)
         return TranslationResponse(translated_text=translated_text)
 
+    except ServiceUnavailableError:
+        raise
     except Exception as e:
         print(f"Translation error in offline mode: {str(e)}")
         return TranslationResponse(translated_text="", error=str(e))
@@ -442,117 +556,459 @@ async def translate(request: TranslationRequest):
 @app.post("/translate_batch/", response_model=List[TranslationResponse])
 async def translate_batch(request: TranslationBatchRequest):
     try:
-        # Process each text individually for now
-        # In a future update, we could process all texts in a single batch for better performance
-        results = []
+        await model_registry.acquire("mt")
+
         start_time = time.time()
-        
-        for text in request.texts:
-            single_request = TranslationRequest(
-                text=text,
-                source_lang=request.source_lang,
-                target_lang=request.target_lang
+        source_lang = get_indic_language_code(request.source_lang)
+        target_lang = get_indic_language_code(request.target_lang)
+
+        # Resolve cached texts and collect every chunk that still needs the model
+        results: List[Optional[TranslationResponse]] = [None] * len(request.texts)
+        text_chunks = {}
+        pending_chunks = []
+        for index, text in enumerate(request.texts):
+            if not text.strip():
+                results[index] = TranslationResponse(translated_text="")
+                continue
+
+            cached_result = translation_cache.get(text, source_lang, target_lang)
+            if cached_result:
+                results[index] = TranslationResponse(translated_text=cached_result)
+                continue
+
+            chunks = split_into_chunks(
+                prepare_input_text(text), decoding_policy.chunk_words_for(request.latency_budget_ms)
             )
-            result = await translate(single_request)
-            results.append(result)
-            
-        print(f"Batch translation of {len(request.texts)} texts completed in {time.time() - start_time:.2f}s")
+            chunk_results = [lookup_chunk(chunk, source_lang, target_lang) for chunk in chunks]
+            text_chunks[index] = (chunks, chunk_results)
+            pending_chunks.extend(
+                chunk for chunk, result in zip(chunks, chunk_results) if result is None
+            )
+
+        # Translate all unique uncached chunks together
+        unique_chunks = list(dict.fromkeys(pending_chunks))
+        generated = {}
+        degraded = set()
+        if unique_chunks:
+            outputs, degraded_flags = await mt_pool.run(
+                translate_chunks, unique_chunks, source_lang, target_lang, request.latency_budget_ms
+            )
+            generated = dict(zip(unique_chunks, outputs))
+            degraded = {chunk for chunk, flag in zip(unique_chunks, degraded_flags) if flag}
+
+        # Reassemble each text in input order
+        for index, (chunks, chunk_results) in text_chunks.items():
+            translated_text = " ".join(
+                result if result is not None else generated[chunk]
+                for chunk, result in zip(chunks, chunk_results)
+            )
+            if not degraded.intersection(chunks):
+                translation_cache.put(request.texts[index], source_lang, target_lang, translated_text)
+            results[index] = TranslationResponse(translated_text=translated_text)
+
+        print(f"Batch translation of {len(request.texts)} texts ({len(unique_chunks)} generated chunks) completed in {time.time() - start_time:.2f}s")
         return results
+    except (HTTPException, ServiceUnavailableError):
+        raise
     except Exception as e:
         print(f"Batch translation error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def convert_to_wav(input_file: str, output_file: str) -> bool:
+def generate_with_streamer(sentence: str, target_lang: str, latency_budget_ms: Optional[float], streamer) -> bool:
+    """Greedy-decode one chunk, pushing tokens to ``streamer`` as they are produced.
+
+    Returns True when the output is below full quality (budget-degraded, or
+    greedy where the policy wanted beam search) and must not be cached.
+    """
+    en_indic_tokenizer, en_indic_model = model_registry.get("mt")
+    policy = decoding_policy.choose(len(en_indic_tokenizer.tokenize(sentence)), latency_budget_ms)
+    # Token streaming only supports a single greedy hypothesis
+    generation_kwargs = dict(policy.generation_kwargs(), num_beams=1)
+    generation_kwargs.pop("length_penalty", None)
+    generation_kwargs.pop("early_stopping", None)
+    inputs = en_indic_tokenizer(
+        sentence, return_tensors="pt", truncation=True, max_length=MAX_SOURCE_TOKENS
+    ).to(device)
+    try:
+        with torch.no_grad():
+            en_indic_model.generate(
+                **inputs,
+                **generation_kwargs,
+                forced_bos_token_id=en_indic_tokenizer.lang_code_to_id[target_lang],
+                streamer=streamer
+            )
+    except Exception:
+        # Unblock the consumer before propagating the error
+        streamer.end()
+        raise
+    return policy.degraded or policy.num_beams > 1
+
+async def iterate_in_thread(iterator):
+    """Consume a blocking iterator without blocking the event loop"""
+    sentinel = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, sentinel)
+        if item is sentinel:
+            return
+        yield item
+
+def format_stream_event(event: dict, stream_format: str) -> str:
+    """Encode one streaming event as an SSE message or an NDJSON line"""
+    data = json.dumps(event, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+@app.post("/translate/stream")
+async def translate_stream(request: TranslationRequest, format: str = "ndjson", tokens: bool = False):
+    """Stream a translation chunk by chunk, in order, as NDJSON or SSE.
+
+    Events are ``chunk`` (one translated chunk), ``token`` (decoded text as
+    it is generated, only with ``tokens=true``), ``done`` (the full
+    translation) and ``error``.
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    await model_registry.acquire("mt")
+
+    source_lang = get_indic_language_code(request.source_lang)
+    target_lang = get_indic_language_code(request.target_lang)
+    budget = request.latency_budget_ms
+
+    async def events():
+        start_time = time.time()
+        translations = []
+        tasks = []
+        # Set when any chunk was decoded below full quality
+        degraded = False
+        try:
+            cached_result = translation_cache.get(request.text, source_lang, target_lang)
+            if cached_result:
+                sentences = [request.text]
+                results = [cached_result]
+            else:
+                sentences = split_into_chunks(prepare_input_text(request.text), decoding_policy.chunk_words_for(budget))
+                results = [lookup_chunk(sentence, source_lang, target_lang) for sentence in sentences]
+                if not tokens:
+                    # Dispatch every uncached chunk now so they share batches,
+                    # then emit them in order as each one completes
+                    pending = [i for i, result in enumerate(results) if result is None]
+                    plans = dict(zip(pending, plan_chunks([sentences[i] for i in pending], budget)))
+                    degraded = any(policy.degraded for _, policy in plans.values())
+                    tasks = [
+                        asyncio.ensure_future(translation_batcher.submit(
+                            (sentence, source_lang, target_lang, *plans[index])
+                        ))
+                        if index in plans else None
+                        for index, sentence in enumerate(sentences)
+                    ]
+
+            for index, sentence in enumerate(sentences):
+                output_text = results[index]
+                if output_text is None and tasks:
+                    output_text = await tasks[index]
+                elif output_text is None:
+                    streamer = TextIteratorStreamer(
+                        model_registry.get("mt")[0], skip_special_tokens=True, timeout=60
+                    )
+                    generation = mt_pool.submit(generate_with_streamer, sentence, target_lang, budget, streamer)
+                    pieces = []
+                    async for text in iterate_in_thread(iter(streamer)):
+                        if text:
+                            pieces.append(text)
+                            yield format_stream_event({"type": "token", "index": index, "text": text}, format)
+                    chunk_degraded = await asyncio.wrap_future(generation)
+                    degraded = degraded or chunk_degraded
+                    output_text = clean_translation_output("".join(pieces), source_lang, target_lang)
+                    if not chunk_degraded:
+                        translation_cache.put(sentence, source_lang, target_lang, output_text)
+                translations.append(output_text)
+                yield format_stream_event({
+                    "type": "chunk",
+                    "index": index,
+                    "total": len(sentences),
+                    "translated_text": output_text
+                }, format)
+
+            translated_text = " ".join(translations)
+            if not degraded:
+                translation_cache.put(request.text, source_lang, target_lang, translated_text)
+            print(f"Streamed translation of {len(sentences)} chunks in {time.time() - start_time:.2f}s")
+            yield format_stream_event({
+                "type": "done",
+                "translated_text": translated_text,
+                "elapsed_ms": round((time.time() - start_time) * 1000)
+            }, format)
+        except Exception as e:
+            print(f"Streaming translation error: {str(e)}")
+            yield format_stream_event({"type": "error", "error": str(e)}, format)
+        finally:
+            for task in tasks:
+                if task is not None and not task.done():
+                    task.cancel()
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    # Keep caches and reverse proxies (nginx) from buffering the events
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Trim silence before Whisper and skip clips with no speech at all
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "true").lower() in ("true", "1", "yes")
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", "-45"))
+VAD_MIN_DYNAMIC_RANGE_DB = float(os.environ.get("VAD_MIN_DYNAMIC_RANGE_DB", "6"))
+VAD_MAX_FLATNESS = float(os.environ.get("VAD_MAX_FLATNESS", "0.45"))
+
+# Spoken language detected once per session and reused until the TTL expires
+language_sessions = LanguageSessionCache(
+    ttl_seconds=float(os.environ.get("LANGUAGE_ID_TTL_SECONDS", "1800")),
+    max_sessions=int(os.environ.get("LANGUAGE_ID_MAX_SESSIONS", "10000")),
+    min_confidence=float(os.environ.get("LANGUAGE_ID_MIN_CONFIDENCE", "0.5")),
+)
+
+def identify_language(audio: np.ndarray, session_id: Optional[str]) -> dict:
+    """Session language, detected on the first 30 s window on a miss (blocking)"""
+    language_id = language_sessions.resolve(session_id, lambda: model_registry.get("asr").detect_language(audio))
+    print(f"Language ID: {language_id} (session={session_id})")
+    return language_id
+
+def decode_for_asr(content: bytes):
+    """Decode uploaded audio and trim silence; returns (audio, vad result or None)"""
+    try:
+        audio = decode_audio(content)
+    except AudioDecodeError as e:
+        print(f"Audio decode error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to convert audio format: {e}")
+    print(f"Decoded {audio.size / SAMPLE_RATE:.2f}s of audio")
+
+    vad = None
+    if VAD_ENABLED:
+        vad = trim_silence(
+            audio,
+            threshold_db=VAD_THRESHOLD_DB,
+            min_dynamic_range_db=VAD_MIN_DYNAMIC_RANGE_DB,
+            max_flatness=VAD_MAX_FLATNESS,
+        )
+        print(f"VAD kept {vad.speech_seconds:.2f}s of {vad.original_seconds:.2f}s audio")
+        audio = vad.audio
+    return audio, vad
+
+def prepare_clip(content: bytes, language: Optional[str], session_id: Optional[str] = None) -> dict:
+    """Decode, trim and identify the language of an uploaded clip (blocking).
+
+    ``audio`` is None when VAD found no speech.
+    """
+    audio, vad = decode_for_asr(content)
+    clip = {"audio": audio, "language": language, "vad": vad.to_dict() if vad is not None else None}
+    if vad is not None and not vad.has_speech:
+        print("No speech detected, skipping transcription")
+        clip["audio"] = None
+        return clip
+
+    if language is None:
+        clip["language_id"] = identify_language(audio, session_id)
+        clip["language"] = clip["language_id"]["language"]
+    return clip
+
+def transcribe_clip(audio: np.ndarray, language: str) -> dict:
+    """Transcribe one clip on its own (blocking)"""
+    return model_registry.get("asr").transcribe(audio, language=language, task="transcribe")
+
+def transcribe_group(items: List[tuple]) -> List[dict]:
+    """Transcribe one batcher group; every clip shares the same language"""
+    language = items[0][1]
+    print(f"Transcribing batch of {len(items)} clips with language: {language}")
+    return model_registry.get("asr").transcribe_batch([item[0] for item in items], language=language)
+
+# Opt-in: with ASR_BATCH_SIZE > 1, short clips from concurrent requests share
+# one padded greedy Whisper batch (one segment per clip, no timestamps);
+# the default of 1 transcribes every clip on its own with full fallback
+ASR_BATCH_SIZE = int(os.environ.get("ASR_BATCH_SIZE", "1"))
+asr_batcher = MicroBatcher(
+    transcribe_group,
+    max_batch_size=ASR_BATCH_SIZE,
+    max_wait_ms=float(os.environ.get("ASR_BATCH_WAIT_MS", "20")),
+    max_batch_tokens=int(os.environ.get("ASR_BATCH_MAX_SECONDS", "240")),
+    cost_fn=lambda item: max(1, math.ceil(len(item[0]) / SAMPLE_RATE)),
+    group_key_fn=lambda item: item[1],
+    max_queue=int(os.environ.get("ASR_BATCH_MAX_QUEUE", "64")),
+    pool=asr_pool,
+    name="asr_batcher",
+)
+
+async def transcribe_scheduled(audio: np.ndarray, language: str) -> dict:
+    """Transcribe through the batcher when the clip fits one Whisper window"""
+    print(f"Starting transcription with language: {language}")
     try:
-        subprocess.run(['ffmpeg', '-i', input_file, '-ar', '16000', '-ac', '1', '-c:a', 'pcm_s16le', output_file], check=True)
-        return True
-    except subprocess.CalledProcessError:
-        return False
+        if ASR_BATCH_SIZE > 1 and len(audio) <= MAX_BATCH_SECONDS * SAMPLE_RATE:
+            return await asr_batcher.submit((audio, language))
+        return await asr_pool.run(transcribe_clip, audio, language)
+    except ServiceUnavailableError:
+        raise
+    except Exception as e:
+        print(f"Transcription error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+
+def request_session_id(request: Request, session_id: Optional[str]) -> Optional[str]:
+    """Session ID from the session_id query parameter or the X-Session-ID header"""
+    return session_id or request.headers.get("x-session-id")
 
 @app.post("/transcribe/realtime/")
-async def transcribe_audio(file: UploadFile = File(...), language: str = "en"):
+async def transcribe_audio(
+    request: Request,
+    file: UploadFile = File(...),
+    language: Optional[str] = None,
+    session_id: Optional[str] = None
+):
+    """Transcribe a clip; without a language it is identified once per session"""
     try:
         print(f"Received audio file: {file.filename}, content_type: {file.content_type}")
+        content = await file.read()
+        print(f"Received audio data size: {len(content)} bytes")
+
+        # Decode in the ASR pool so the event loop stays free, then
+        # transcribe together with other pending clips
+        await model_registry.acquire("asr")
+        clip = await asr_pool.run(prepare_clip, content, language, request_session_id(request, session_id))
+        if clip["audio"] is None:
+            result = {"text": "", "language": clip["language"]}
+        else:
+            result = await transcribe_scheduled(clip["audio"], clip["language"])
+        print(f"Transcription result: {result['text']}")
         
-        # Create a temporary file to store the uploaded audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_audio:
-            content = await file.read()
-            print(f"Received audio data size: {len(content)} bytes")
-            temp_audio.write(content)
-            temp_audio_path = temp_audio.name
-            print(f"Saved audio to: {temp_audio_path}")
-
-        # Create a temporary WAV file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_wav:
-            temp_wav_path = temp_wav.name
-            print(f"Will convert to WAV at: {temp_wav_path}")
-
-        # Convert the audio to WAV format with specific parameters for webm/opus
-        print("Converting audio to WAV format...")
-        try:
-            subprocess.run([
-                'ffmpeg',
-                '-fflags', '+genpts',  # Generate presentation timestamps
-                '-i', temp_audio_path,
-                '-c:a', 'pcm_s16le',  # Use 16-bit PCM for output
-                '-ar', '16000',       # Set sample rate to 16kHz
-                '-ac', '1',           # Convert to mono
-                '-f', 'wav',          # Force WAV format output
-                '-y',                 # Overwrite output file if exists
-                temp_wav_path
-            ], check=True, capture_output=True, text=True)
-            print("Audio conversion successful")
-        except subprocess.CalledProcessError as e:
-            print(f"FFmpeg error: {e.stderr}")
-            raise HTTPException(status_code=500, detail=f"Failed to convert audio format: {e.stderr}")
-
-        # Verify the WAV file exists and has content
-        if not os.path.exists(temp_wav_path):
-            raise HTTPException(status_code=500, detail="WAV file was not created")
-        
-        wav_size = os.path.getsize(temp_wav_path)
-        print(f"WAV file size: {wav_size} bytes")
+        # Add detected language to response
+        detected_language = result.get('language', language)
+        print(f"Detected language: {detected_language}")
         
-        if wav_size == 0:
-            raise HTTPException(status_code=500, detail="WAV file is empty")
+        response = {
+            "text": result["text"],
+            "detected_language": detected_language
+        }
+        if clip["vad"] is not None:
+            response["vad"] = clip["vad"]
+        if "language_id" in clip:
+            response["language_id"] = clip["language_id"]
+        return response
 
-        # Transcribe the audio with specific parameters
-        print(f"Starting transcription with language: {language}")
-        try:
-            result = model.transcribe(
-                temp_wav_path,
-                language=language,
-                task="transcribe",
-                fp16=False,  # Disable half-precision for better compatibility
-                verbose=True  # Enable verbose output for debugging
-            )
-            print(f"Transcription result: {result['text']}")
-            
-            # Add detected language to response
-            detected_language = result.get('language', language)
-            print(f"Detected language: {detected_language}")
-            
-            return {
-                "text": result["text"],
-                "detected_language": detected_language
-            }
-        except Exception as e:
-            print(f"Transcription error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+    except (HTTPException, ServiceUnavailableError):
+        raise
+    except Exception as e:
+        print(f"Error in transcribe_audio: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Window and hypothesis interval for /transcribe/stream
+STREAM_WINDOW_SECONDS = float(os.environ.get("STREAM_WINDOW_SECONDS", "8"))
+STREAM_STEP_SECONDS = float(os.environ.get("STREAM_STEP_SECONDS", "1"))
+
+def transcribe_window(audio: np.ndarray, language: str, prompt: Optional[str] = None) -> dict:
+    """Transcribe one streaming window held in memory (blocking)"""
+    return model_registry.get("asr").transcribe(
+        audio,
+        language=language,
+        task="transcribe",
+        initial_prompt=prompt,
+        condition_on_previous_text=False
+    )
+
+def stream_control_event(text: str) -> Optional[str]:
+    """Parse a control message sent as text on the streaming socket"""
+    try:
+        return json.loads(text).get("event")
+    except (ValueError, AttributeError):
+        return text.strip().lower() or None
+
+@app.websocket("/transcribe/stream")
+async def transcribe_stream(websocket: WebSocket, language: str = "en", format: str = "pcm16"):
+    """Stream audio frames in and receive partial and final transcripts.
+
+    Binary messages carry audio (16 kHz mono s16le for ``format=pcm16``, or a
+    webm/ogg Opus stream). Send the text message ``{"event": "stop"}`` to
+    finalize the last window. Every hypothesis is sent as JSON with
+    ``type`` set to ``partial`` or ``final``.
+    """
+    await websocket.accept()
+    try:
+        decoder = create_stream_decoder(format)
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1003)
+        return
 
-        # Clean up temporary files
+    buffer = RollingAudioBuffer(STREAM_WINDOW_SECONDS, STREAM_STEP_SECONDS)
+    segment = 0
+    previous_text = None
+    print(f"Streaming transcription started (format={format}, language={language})")
+
+    async def emit(kind: str) -> Optional[int]:
+        """Send a hypothesis; if the ASR pool is busy return its Retry-After instead.
+
+        The audio stays buffered, so a skipped partial is covered by the
+        next one and a skipped final is retried.
+        """
+        nonlocal segment, previous_text
+        start = buffer.offset
         try:
-            os.unlink(temp_audio_path)
-            os.unlink(temp_wav_path)
-            print("Temporary files cleaned up")
-        except Exception as e:
-            print(f"Warning: Failed to clean up temporary files: {str(e)}")
+            result = await asr_pool.run(transcribe_window, buffer.window(), language, previous_text)
+        except PoolSaturatedError as e:
+            print(f"Streaming transcription: ASR pool busy, skipping a {kind} hypothesis")
+            return e.retry_after
+        text = result["text"].strip()
+        await websocket.send_json({
+            "type": kind,
+            "segment": segment,
+            "text": text,
+            "start": round(start, 2),
+            "end": round(start + buffer.duration, 2),
+            "detected_language": result.get("language", language)
+        })
+        if kind == "final":
+            buffer.commit()
+            segment += 1
+            previous_text = text or previous_text
+        return None
 
-        return {"text": result["text"]}
+    try:
+        await model_registry.acquire("asr")
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
 
+            # Writing to ffmpeg and flushing it can block, so decoder calls
+            # run in a thread rather than on the event loop
+            if message.get("bytes"):
+                buffer.append(await asyncio.to_thread(decoder.feed, message["bytes"]))
+            elif message.get("text") and stream_control_event(message["text"]) == "stop":
+                buffer.append(await asyncio.to_thread(decoder.close))
+                while len(buffer):
+                    retry_after = await emit("final")
+                    if retry_after is not None:
+                        await asyncio.sleep(retry_after)
+                await websocket.send_json({"type": "done", "segments": segment})
+                await websocket.close()
+                return
+
+            # Only the latest state matters, so a slow window simply merges
+            # the frames that arrived meanwhile into the next hypothesis
+            action = buffer.ready()
+            if action:
+                await emit(action)
+    except WebSocketDisconnect:
+        print("Streaming transcription client disconnected")
+    except ServiceUnavailableError as e:
+        await websocket.send_json({"type": "error", "error": str(e), "retry_after": e.retry_after})
+        await websocket.close(code=1013)  # Try again later
     except Exception as e:
-        print(f"Error in transcribe_audio: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Streaming transcription error: {str(e)}")
+        try:
+            await websocket.send_json({"type": "error", "error": str(e)})
+            await websocket.close(code=1011)  # Internal error
+        except Exception:
+            pass  # The client is already gone
+    finally:
+        await asyncio.to_thread(decoder.close)
 
 class TestTranscribeRequest(BaseModel):
     test: bool = True
@@ -587,220 +1043,205 @@ async def health_check():
         
         return {
             "status": "ok",
-            "tts_service": "google_tts",
+            "tts_service": tts_service_name(),
             "available_languages": languages
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return {"status": "error", "error": str(e)}
 
-# Simplified Translation Dictionary - English to Hindi
-en_hi_simple_dict = {
-    "i": "मैं",
-    "me": "मुझे",
-    "my": "मेरा",
-    "mine": "मेरा",
-    "you": "आप",
-    "your": "आपका",
-    "he": "वह",
-    "she": "वह",
-    "his": "उसका",
-    "her": "उसकी",
-    "it": "यह",
-    "we": "हम",
-    "they": "वे",
-    "their": "उनका",
-    "am": "हूँ",
-    "is": "है",
-    "are": "हैं",
-    "was": "था",
-    "were": "थे",
-    "have": "है",
-    "has": "है",
-    "had": "था",
-    "will": "करेंगे",
-    "would": "करेंगे",
-    "can": "सकते हैं",
-    "could": "सकते थे",
-    "should": "चाहिए",
-    "the": "",
-    "a": "एक",
-    "an": "एक",
-    "in": "में",
-    "on": "पर",
-    "at": "पर",
-    "for": "के लिए",
-    "to": "को",
-    "from": "से",
-    "with": "के साथ",
-    "without": "के बिना",
-    "and": "और",
-    "or": "या",
-    "but": "लेकिन",
-    "because": "क्योंकि",
-    "if": "अगर",
-    "hello": "नमस्ते",
-    "hi": "नमस्ते",
-    "good": "अच्छा",
-    "morning": "सुबह",
-    "evening": "शाम",
-    "night": "रात",
-    "bye": "अलविदा",
-    "goodbye": "अलविदा",
-    "yes": "हाँ",
-    "no": "नहीं",
-    "please": "कृपया",
-    "thank": "धन्यवाद",
-    "thanks": "धन्यवाद",
-    "welcome": "स्वागत है",
-    "sorry": "माफ़ करें",
-    "excuse": "क्षमा करें",
-    "how": "कैसे",
-    "what": "क्या",
-    "when": "कब",
-    "where": "कहाँ",
-    "who": "कौन",
-    "why": "क्यों",
-    "which": "कौन सा",
-    "time": "समय",
-    "day": "दिन",
-    "today": "आज",
-    "tomorrow": "कल",
-    "yesterday": "कल",
-    "name": "नाम",
-    "food": "खाना",
-    "water": "पानी",
-    "money": "पैसा",
-    "home": "घर",
-    "house": "घर",
-    "work": "काम",
-    "school": "स्कूल",
-    "book": "किताब",
-    "phone": "फोन",
-    "computer": "कंप्यूटर",
-    "friend": "मित्र",
-    "family": "परिवार"
-}
-
-def simple_translate(text, source_lang, target_lang):
-    """Simple word-by-word translation for very basic texts"""
-    if source_lang != "en" or target_lang != "hi":
-        return None  # Only support en->hi for now
-        
-    words = text.lower().split()
-    if len(words) > 7:  # Only for very short texts
-        return None
-        
-    # Simple word-by-word translation
-    translated_words = []
-    for word in words:
-        # Remove punctuation for lookup
-        clean_word = word.strip('.,!?;:')
-        if clean_word in en_hi_simple_dict:
-            # If the word has punctuation, add it back
-            if clean_word != word:
-                punctuation = word[len(clean_word):]
-                translated_words.append(en_hi_simple_dict[clean_word] + punctuation)
-            else:
-                translated_words.append(en_hi_simple_dict[clean_word])
-        else:
-            # If not found, keep original
-            translated_words.append(word)
-            
-    # Add appropriate word order for Hindi
-    result = " ".join(translated_words)
-    
-    # Clean up the text
-    result = result.replace("  ", " ").strip()
-    
-    return result
+def load_tts_engine():
+    """Start the configured TTS backends; gTTS is left out in offline mode"""
+    return load_tts_router(offline=OFFLINE_MODE)
 
 class TTSRequest(BaseModel):
     text: str
     language: str
+    voice: Optional[str] = None  # Backend-specific voice, e.g. a Piper voice name or gTTS accent domain
+    speed: float = Field(1.0, gt=0.25, le=4.0)
+
+# Every backend's output is served in this one format, whatever it produces natively
+TTS_OUTPUT_SUFFIX = "." + os.environ.get("TTS_OUTPUT_FORMAT", "mp3").lower().lstrip(".")
+if TTS_OUTPUT_SUFFIX not in AUDIO_MEDIA_TYPES:
+    raise ValueError(f"Unknown TTS_OUTPUT_FORMAT '{TTS_OUTPUT_SUFFIX[1:]}'. Use 'mp3' or 'wav'.")
+TTS_OUTPUT_MEDIA_TYPE = AUDIO_MEDIA_TYPES[TTS_OUTPUT_SUFFIX]
+
+async def synthesize_cached(text: str, language: str, voice: Optional[str], speed: float):
+    """Return (key, path) for a clip in TTS_OUTPUT_FORMAT, synthesizing it on a cache miss"""
+    tts_router = await model_registry.acquire("tts")
+    backend = tts_router.backend_for(language)
+    if backend is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"No TTS backend is available for language '{language}'. Available: {tts_router.languages()}"
+        )
+
+    try:
+        voice = backend.resolve_voice(language, voice)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The resolved voice names the backend and format too, so clips are never mixed up
+    key = make_tts_key(text, language, f"{backend.name}:{voice}{TTS_OUTPUT_SUFFIX}", speed)
+    # The lookup may glob the cache directory and touches the file, so keep it off the loop
+    audio_path = await asyncio.to_thread(tts_cache.get, key)
+    if audio_path is None:
+        audio_path = await tts_pool.run(
+            tts_cache.get_or_create,
+            key,
+            lambda path: synthesize_as(backend, text, language, voice, speed, path, TTS_OUTPUT_SUFFIX),
+            TTS_OUTPUT_SUFFIX,
+        )
+        logger.info(f"Generated speech for text '{text}' in {language} with {backend.name}")
+    else:
+        logger.info(f"TTS cache hit for text '{text}' in {language}")
+    return key, audio_path
 
 @app.post("/tts/")
-async def text_to_speech(request: TTSRequest):
-    """Generate speech from text using Google TTS"""
+async def text_to_speech(request: TTSRequest, http_request: Request):
+    """Generate speech from text with the backend configured for the language"""
     try:
         text = request.text
         language = request.language
         
         logger.info(f"TTS request: language={language}, text='{text}'")
         
-        # Create temporary file for speech output
-        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
-            output_path = temp_file.name
-        
-        # Supported language mapping
-        supported_langs = {
-            'en': 'en', 'hi': 'hi', 'ta': 'ta', 'te': 'te', 
-            'ml': 'ml', 'bn': 'bn', 'mr': 'mr', 'gu': 'gu', 
-            'kn': 'kn', 'pa': 'pa', 'ur': 'ur'
-        }
-        
-        if language not in supported_langs:
+        if language not in LANGUAGE_NAMES:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Language '{language}' is not supported. Supported languages: {list(supported_langs.keys())}"
+                detail=f"Language '{language}' is not supported. Supported languages: {list(LANGUAGE_NAMES)}"
             )
         
-        # Generate speech using Google TTS
-        tts_lang = supported_langs.get(language, 'en')
-        tts = gTTS(text=text, lang=tts_lang, slow=False)
-        tts.save(output_path)
-        
-        logger.info(f"Generated speech for text '{text}' in {language}")
+        # Identical prompts are synthesized once and then served from disk
+        key, audio_path = await synthesize_cached(text, language, request.voice, request.speed)
         
         # Return the audio file
-        return FileResponse(
-            path=output_path,
-            media_type="audio/mp3",
-            filename=f"tts_{language}_{int(time.time())}.mp3"
+        return file_response(
+            http_request,
+            audio_path,
+            media_type=TTS_OUTPUT_MEDIA_TYPE,
+            etag=key,
+            filename=f"tts_{language}_{key[:12]}{TTS_OUTPUT_SUFFIX}",
+            headers={"Content-Location": f"/tts/audio/{key}"}
         )
+    except (HTTPException, ServiceUnavailableError):
+        raise
     except Exception as e:
         logger.error(f"TTS error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/tts/audio/{key}")
+async def get_tts_audio(key: str, request: Request):
+    """Serve a cached clip by its content address, with Range and ETag support"""
+    audio_path = await asyncio.to_thread(tts_cache.get, key) if re.fullmatch(r"[0-9a-f]{64}", key) else None
+    if audio_path is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return file_response(
+        request, audio_path, media_type=AUDIO_MEDIA_TYPES.get(audio_path.suffix, "application/octet-stream"), etag=key
+    )
+
+# Number of sentences synthesized ahead of the one being streamed
+TTS_STREAM_PREFETCH = int(os.environ.get("TTS_STREAM_PREFETCH", "2"))
+# How often a later segment is retried when the TTS pool is saturated; the
+# response has already started, so giving up would truncate the audio
+TTS_STREAM_RETRIES = int(os.environ.get("TTS_STREAM_RETRIES", "30"))
+
+def split_for_speech(text: str) -> List[str]:
+    """Split text into sentences (including danda-terminated ones) for streaming TTS"""
+    return [sentence.strip() for sentence in re.split(r'(?<=[.!?।॥])\s+', text) if sentence.strip()]
+
+@app.post("/tts/stream")
+async def text_to_speech_stream(request: TTSRequest):
+    """Stream speech sentence by sentence while later sentences are synthesized.
+
+    mp3 segments are sent as bare frames, without their ID3 tags and
+    Xing/Info headers; wav output is one header of unknown length followed
+    by the PCM of every segment. A later segment that hits a saturated TTS
+    pool is retried rather than cutting the stream short.
+    """
+    if request.language not in LANGUAGE_NAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Language '{request.language}' is not supported. Supported languages: {list(LANGUAGE_NAMES)}"
+        )
+    sentences = split_for_speech(request.text)
+    if not sentences:
+        raise HTTPException(status_code=400, detail="Text is empty")
+
+    def synthesize(sentence: str):
+        return asyncio.ensure_future(synthesize_cached(sentence, request.language, request.voice, request.speed))
+
+    # Synthesize the first sentence up front so errors still get a status code
+    start_time = time.time()
+    tasks = [synthesize(sentence) for sentence in sentences[:1 + TTS_STREAM_PREFETCH]]
+    try:
+        await tasks[0]
+    except BaseException:
+        for task in tasks[1:]:
+            task.cancel()
+        raise
+    print(f"TTS stream: first of {len(sentences)} segments ready in {time.time() - start_time:.2f}s")
+
+    async def segment(index: int):
+        for _ in range(TTS_STREAM_RETRIES):
+            try:
+                return await tasks[index]
+            except ServiceUnavailableError as e:
+                logger.warning(f"TTS stream: segment {index} waiting for the TTS pool ({e})")
+                await asyncio.sleep(e.retry_after)
+                tasks[index] = synthesize(sentences[index])
+        return await tasks[index]
+
+    async def audio():
+        try:
+            for index in range(len(sentences)):
+                _, audio_path = await segment(index)
+                # Keep the pipeline full while this segment is sent
+                next_index = index + 1 + TTS_STREAM_PREFETCH
+                if next_index < len(sentences):
+                    tasks.append(synthesize(sentences[next_index]))
+                if TTS_OUTPUT_SUFFIX == ".wav":
+                    channels, sample_width, sample_rate, pcm = await asyncio.to_thread(read_wav_pcm, str(audio_path))
+                    if index == 0:
+                        yield streaming_wav_header(channels, sample_width, sample_rate)
+                    yield pcm
+                else:
+                    # Without per-clip tags and VBR headers players play past the first clip
+                    yield await asyncio.to_thread(read_mp3_frames, str(audio_path))
+            print(f"TTS stream: {len(sentences)} segments in {time.time() - start_time:.2f}s")
+        except Exception as e:
+            # Headers are already sent; end the stream early
+            logger.error(f"TTS stream error: {str(e)}")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(
+        audio(),
+        media_type=TTS_OUTPUT_MEDIA_TYPE,
+        headers={"X-TTS-Segments": str(len(sentences))}
+    )
+
 @app.get("/tts/available_models")
 async def get_available_tts_models():
     """Get available TTS models"""
-    supported_languages = [
-        'en', 'hi', 'ta', 'te', 'ml', 'bn', 'mr', 'gu', 'kn', 'pa', 'ur'
-    ]
-    
-    language_names = {
-        'en': 'English',
-        'hi': 'Hindi',
-        'ta': 'Tamil',
-        'te': 'Telugu',
-        'ml': 'Malayalam',
-        'bn': 'Bengali',
-        'mr': 'Marathi',
-        'gu': 'Gujarati',
-        'kn': 'Kannada',
-        'pa': 'Punjabi',
-        'ur': 'Urdu',
-    }
+    tts_router = await model_registry.acquire("tts")
+    supported_languages = tts_router.languages()
     
     return {
         "supported_languages": supported_languages,
-        "language_names": language_names
+        "language_names": {code: LANGUAGE_NAMES[code] for code in supported_languages},
+        "backends": tts_router.describe()
     }
 
 @app.post("/tts/test")
 async def test_tts(request: TTSRequest):
     """Test TTS without generating audio - just verifies the service is working"""
-    supported_langs = {
-        'en': 'en', 'hi': 'hi', 'ta': 'ta', 'te': 'te', 
-        'ml': 'ml', 'bn': 'bn', 'mr': 'mr', 'gu': 'gu', 
-        'kn': 'kn', 'pa': 'pa', 'ur': 'ur'
-    }
-    
-    if request.language not in supported_langs:
+    if request.language not in LANGUAGE_NAMES:
         raise HTTPException(
             status_code=400, 
-            detail=f"Language '{request.language}' is not supported. Supported languages: {list(supported_langs.keys())}"
+            detail=f"Language '{request.language}' is not supported. Supported languages: {list(LANGUAGE_NAMES)}"
         )
     
     return {
@@ -816,26 +1257,250 @@ async def test_tts_get():
     return {
         "status": "ok",
         "message": "TTS service is available",
-        "service": "google_tts"
+        "service": tts_service_name()
     }
 
+def tts_service_name() -> str:
+    """Names of the TTS backends in use, or "loading" before they start"""
+    if not model_registry.is_ready("tts"):
+        return "loading"
+    return ",".join(backend.name for backend in model_registry.get("tts").backends)
+
 async def get_supported_languages():
     """Get supported languages for all services"""
-    supported_languages = [
-        'en', 'hi', 'ta', 'te', 'ml', 'bn', 'mr', 'gu', 'kn', 'pa', 'ur'
-    ]
+    if model_registry.is_ready("tts"):
+        supported_languages = model_registry.get("tts").languages()
+    else:
+        supported_languages = list(LANGUAGE_NAMES)
     
     return {"languages": supported_languages}
 
+def transcribe_segments(audio: np.ndarray, language: str, on_segment) -> str:
+    """Run ASR and hand each finalized segment to on_segment (blocking); returns the language"""
+    detected_language, segments = model_registry.get("asr").iter_segments(audio, language=language)
+    for segment in segments:
+        on_segment(segment)
+    return detected_language
+
+def is_sentence_end(text: str) -> bool:
+    return text.rstrip().endswith(('.', '?', '!', '।', '॥'))
+
+async def run_speech_pipeline(
+    file: UploadFile,
+    source_lang: Optional[str],
+    session_id: Optional[str],
+    target_lang: str,
+    voice: Optional[str],
+    speed: float,
+    include_audio: bool
+) -> dict:
+    """Transcribe, translate and synthesize one utterance.
+
+    The stages overlap: ASR segments are grouped into sentences, each
+    sentence is translated as soon as it is final, and each translation is
+    synthesized as soon as it is ready. Audio is returned base64-encoded
+    along with per-stage timings (milliseconds since the request started).
+    """
+    start_time = time.time()
+
+    def elapsed_ms() -> int:
+        return round((time.time() - start_time) * 1000)
+
+    if include_audio and target_lang not in LANGUAGE_NAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Language '{target_lang}' is not supported for speech. Supported languages: {list(LANGUAGE_NAMES)}"
+        )
+    await model_registry.acquire("asr")
+    await model_registry.acquire("mt")
+    if include_audio:
+        await model_registry.acquire("tts")
+
+    content = await file.read()
+    print(f"Speech-to-speech request: {len(content)} bytes, {source_lang or 'auto'} -> {target_lang}")
+    audio, vad = await asr_pool.run(decode_for_asr, content)
+    timings = {"decode_ms": elapsed_ms()}
+    if vad is not None and not vad.has_speech:
+        timings["total_ms"] = elapsed_ms()
+        return {
+            "text": "", "detected_language": source_lang, "translated_text": "", "segments": [],
+            "audio": None, "audio_media_type": None, "vad": vad.to_dict(), "timings": timings
+        }
+
+    loop = asyncio.get_running_loop()
+    asr_segments: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    def on_segment(segment: dict):
+        loop.call_soon_threadsafe(asr_segments.put_nowait, segment)
+
+    # Filled in by the ASR thread before the first segment is queued
+    language_id = {}
+
+    def run_asr():
+        try:
+            language = source_lang
+            if language is None:
+                language_id.update(identify_language(audio, session_id))
+                language = language_id["language"]
+            language_id.setdefault("language", language)
+            return transcribe_segments(audio, language, on_segment)
+        finally:
+            loop.call_soon_threadsafe(asr_segments.put_nowait, finished)
+
+    async def process_sentence(sentence: dict) -> dict:
+        mt_start = elapsed_ms()
+        translated = await translate_text(
+            sentence["text"], get_indic_language_code(sentence["language"]), get_indic_language_code(target_lang)
+        )
+        sentence.update(translated_text=translated, mt_start_ms=mt_start, mt_end_ms=elapsed_ms())
+        if include_audio and translated:
+            _, audio_path = await synthesize_cached(translated, target_lang, voice, speed)
+            sentence.update(audio_path=str(audio_path), tts_end_ms=elapsed_ms())
+        return sentence
+
+    asr_future = asr_pool.submit(run_asr)
+    tasks = []
+    pending_text = []
+    pending_start = None
+    try:
+        while True:
+            segment = await asr_segments.get()
+            if segment is not finished:
+                if not segment["text"].strip():
+                    continue
+                pending_start = segment["start"] if pending_start is None else pending_start
+                pending_text.append(segment["text"].strip())
+                pending_end = segment["end"]
+            # Translate whole sentences; whatever is left goes when ASR ends
+            if pending_text and (segment is finished or is_sentence_end(pending_text[-1])):
+                sentence = {
+                    "text": " ".join(pending_text), "start": pending_start, "end": pending_end,
+                    "language": language_id["language"], "asr_ms": elapsed_ms()
+                }
+                tasks.append(asyncio.ensure_future(process_sentence(sentence)))
+                pending_text, pending_start = [], None
+            if segment is finished:
+                break
+        detected_language = await asyncio.wrap_future(asr_future)
+        timings["asr_ms"] = elapsed_ms()
+        sentences = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    clips = [sentence.pop("audio_path") for sentence in sentences if "audio_path" in sentence]
+    audio_bytes = await asyncio.to_thread(concat_audio, clips, TTS_OUTPUT_SUFFIX) if clips else None
+    for sentence in sentences:
+        sentence.pop("language", None)
+
+    timings.update(
+        mt_ms=max((s["mt_end_ms"] for s in sentences), default=timings["asr_ms"]),
+        tts_ms=max((s.get("tts_end_ms", 0) for s in sentences), default=0) if include_audio else None,
+        first_translation_ms=min((s["mt_end_ms"] for s in sentences), default=None),
+        first_audio_ms=min((s["tts_end_ms"] for s in sentences if "tts_end_ms" in s), default=None),
+        total_ms=elapsed_ms()
+    )
+    print(f"Speech-to-speech: {len(sentences)} sentences, timings {timings}")
+
+    response = {
+        "text": " ".join(s["text"] for s in sentences),
+        "detected_language": detected_language or language_id["language"],
+        "translated_text": " ".join(s["translated_text"] for s in sentences if s["translated_text"]),
+        "segments": sentences,
+        "audio": base64.b64encode(audio_bytes).decode("ascii") if audio_bytes else None,
+        "audio_media_type": TTS_OUTPUT_MEDIA_TYPE if audio_bytes else None,
+        "timings": timings
+    }
+    if vad is not None:
+        response["vad"] = vad.to_dict()
+    if "source" in language_id:
+        response["language_id"] = language_id
+    return response
+
+@app.post("/speech_to_speech/")
+async def speech_to_speech(
+    request: Request,
+    file: UploadFile = File(...),
+    source_lang: Optional[str] = None,
+    session_id: Optional[str] = None,
+    target_lang: str = "hi",
+    voice: Optional[str] = None,
+    speed: float = Query(1.0, gt=0.25, le=4.0),
+    include_audio: bool = True
+):
+    """Transcript, translation and synthesized speech in one round trip"""
+    try:
+        return await run_speech_pipeline(
+            file, source_lang, request_session_id(request, session_id), target_lang, voice, speed, include_audio
+        )
+    except (HTTPException, ServiceUnavailableError):
+        raise
+    except Exception as e:
+        logger.error(f"Speech-to-speech error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/ready")
+async def ready():
+    """Report per-model loading state; 503 until every eager model is loaded"""
+    return JSONResponse(
+        status_code=200 if model_registry.ready else 503,
+        content={
+            "ready": model_registry.ready,
+            "load_mode": MODEL_LOAD_MODE,
+            "models": model_registry.status()
+        }
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Report batching counters for the inference schedulers"""
+    return {
+        "translation_cache": translation_cache.stats(),
+        "phrasebook": phrasebook.stats(),
+        "tts_cache": tts_cache.stats(),
+        "language_id": language_sessions.stats(),
+        "translation_batcher": translation_batcher.stats(),
+        "asr_batcher": asr_batcher.stats(),
+        "pools": {
+            "asr": asr_pool.stats(),
+            "mt": mt_pool.stats(),
+            "tts": tts_pool.stats(),
+        }
+    }
+
+# Register models; "eager" loads them here, "background" after startup,
+# "lazy" (or names listed in LAZY_MODELS) on the first request that needs them
+for name, loader in (("asr", load_whisper_model), ("mt", load_translation_model), ("tts", load_tts_engine)):
+    model_registry.register(name, loader, lazy=MODEL_LOAD_MODE == "lazy" or name in LAZY_MODELS)
+
+if MODEL_LOAD_MODE == "eager":
+    model_registry.load_all()
+
 # Add cleanup to startup
 @app.on_event("startup")
 async def startup_event():
     """Initialize any resources on startup"""
+    await translation_batcher.start()
+    await asr_batcher.start()
+    if MODEL_LOAD_MODE == "background":
+        model_registry.start()
     print("\n" + "="*50)
     print("SERVER RUNNING IN OFFLINE MODE ONLY")
     print("All models and resources are loaded locally")
     print("="*50 + "\n")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background schedulers"""
+    await translation_batcher.stop()
+    await asr_batcher.stop()
+    model_registry.stop()
+    for pool in (asr_pool, mt_pool, tts_pool):
+        pool.shutdown()
+    translation_cache.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
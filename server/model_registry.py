@@ -0,0 +1,219 @@
+"""Background and lazy model loading with per-model readiness.
+
+Models are registered with a loader function instead of being loaded at
+import time. ``ModelRegistry.start`` loads every eager model concurrently
+in background threads once the server is up, while lazy models are only
+loaded by the first request that needs them. Handlers ``await
+registry.acquire(name)``; if the model is still loading past the wait
+timeout they get ``ModelNotReadyError`` (503 + Retry-After).
+
+A failed load is retried with exponential backoff (``retry_backoff``
+doubling up to ``max_retry_backoff``): eager models retry in the
+background, lazy models on the first request after the backoff expires.
+Meanwhile the model is reported as ``retrying``. After ``max_attempts``
+failures (0 means never give up) it stays ``failed``, as it does at once
+when the loader raises ``ModelConfigurationError``.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from inference_pool import ServiceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+RETRYING = "retrying"
+FAILED = "failed"
+
+
+class ModelNotReadyError(ServiceUnavailableError):
+    """Raised when a request needs a model that is not loaded yet."""
+
+    def __init__(self, name: str, state: str, retry_after: int = 5):
+        super().__init__(f"Model '{name}' is not ready (state: {state})", retry_after)
+        self.name = name
+        self.state = state
+
+
+class ModelConfigurationError(RuntimeError):
+    """Raised by a loader when retrying cannot help, e.g. no engine is installed."""
+
+
+class ModelSlot:
+    """One named model, its loader and its loading state."""
+
+    def __init__(self, name: str, loader: Callable[[], Any], lazy: bool = False):
+        self.name = name
+        self.loader = loader
+        self.lazy = lazy
+        self.state = PENDING
+        self.value = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.future: Optional[Future] = None
+        self.attempts = 0
+        self.retry_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Any:
+        """Run the loader once; concurrent callers share the same result."""
+        with self._lock:
+            if self.state == READY:
+                return self.value
+            self.state = LOADING
+            self.error = None
+            self.retry_at = None
+            self.attempts += 1
+            start = time.time()
+            print(f"Loading model '{self.name}'...")
+            try:
+                self.value = self.loader()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                logger.error(f"Failed to load model '{self.name}': {e}")
+                raise
+            self.load_seconds = time.time() - start
+            self.state = READY
+            print(f"Model '{self.name}' ready in {self.load_seconds:.1f}s")
+            return self.value
+
+    def retry_in(self) -> float:
+        """Seconds until the next load attempt is due (0 if it is due now)."""
+        if self.retry_at is None:
+            return 0.0
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "lazy": self.lazy,
+            "load_seconds": round(self.load_seconds, 2) if self.load_seconds is not None else None,
+            "error": self.error,
+            "attempts": self.attempts,
+            "retry_in_seconds": round(self.retry_in(), 1) if self.state == RETRYING else None,
+        }
+
+
+class ModelRegistry:
+    """Registry of models loaded in the background or on first use."""
+
+    def __init__(
+        self,
+        wait_timeout: float = 60.0,
+        retry_after: int = 5,
+        retry_backoff: float = 5.0,
+        max_retry_backoff: float = 300.0,
+        max_attempts: int = 0,
+    ):
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self.retry_backoff = max(0.0, retry_backoff)
+        self.max_retry_backoff = max(self.retry_backoff, max_retry_backoff)
+        self.max_attempts = max(0, max_attempts)
+        self._slots: Dict[str, ModelSlot] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopping = threading.Event()
+
+    def register(self, name: str, loader: Callable[[], Any], lazy: bool = False):
+        self._slots[name] = ModelSlot(name, loader, lazy)
+
+    def _load(self, slot: ModelSlot, retry: bool) -> Any:
+        """Load a slot; on failure schedule the next attempt and, if ``retry``, wait for it."""
+        while True:
+            try:
+                return slot.load()
+            except ModelConfigurationError:
+                logger.error(f"Model '{slot.name}' is misconfigured, not retrying")
+                raise
+            except Exception:
+                if self.max_attempts and slot.attempts >= self.max_attempts:
+                    logger.error(f"Giving up on model '{slot.name}' after {slot.attempts} attempts")
+                    raise
+                delay = min(self.max_retry_backoff, self.retry_backoff * 2 ** (slot.attempts - 1))
+                slot.retry_at = time.monotonic() + delay
+                slot.state = RETRYING
+                logger.warning(f"Retrying model '{slot.name}' in {delay:.0f}s (attempt {slot.attempts + 1})")
+                if not retry or self._stopping.wait(delay):
+                    raise
+
+    def _submit(self, slot: ModelSlot) -> Future:
+        # A finished future is only replaced after a failure whose backoff has expired
+        due = slot.future is not None and slot.future.done() and slot.state == RETRYING and slot.retry_in() == 0
+        if slot.future is None or due:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, len(self._slots)), thread_name_prefix="model-loader"
+                )
+            slot.future = self._executor.submit(self._load, slot, not slot.lazy)
+        return slot.future
+
+    def start(self):
+        """Start loading every eager model concurrently in the background."""
+        for slot in self._slots.values():
+            if not slot.lazy:
+                self._submit(slot)
+
+    def stop(self):
+        """Stop background retries; loads already running finish on their own."""
+        self._stopping.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def load_all(self):
+        """Load every model synchronously in the calling thread."""
+        for slot in self._slots.values():
+            slot.load()
+
+    def _not_ready(self, slot: ModelSlot) -> ModelNotReadyError:
+        retry_after = self.retry_after
+        if slot.state == RETRYING:
+            retry_after = max(1, math.ceil(slot.retry_in()))
+        return ModelNotReadyError(slot.name, slot.state, retry_after)
+
+    def get(self, name: str) -> Any:
+        """Return a loaded model, raising ``ModelNotReadyError`` otherwise."""
+        slot = self._slots[name]
+        if slot.state != READY:
+            raise self._not_ready(slot)
+        return slot.value
+
+    async def acquire(self, name: str) -> Any:
+        """Return a model, triggering a lazy load and waiting up to ``wait_timeout``.
+
+        While a failed model waits for its next attempt this raises at once,
+        with Retry-After set to the remaining backoff.
+        """
+        slot = self._slots[name]
+        if slot.state == READY:
+            return slot.value
+        if slot.state == FAILED or (slot.state == RETRYING and slot.retry_in() > 0):
+            raise self._not_ready(slot)
+
+        future = self._submit(slot)
+        if self.wait_timeout <= 0:
+            raise self._not_ready(slot)
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.wait_timeout)
+        except Exception:
+            # Timed out, or the loader failed (the slot records the error)
+            raise self._not_ready(slot)
+        return slot.value
+
+    def is_ready(self, name: str) -> bool:
+        return self._slots[name].state == READY
+
+    @property
+    def ready(self) -> bool:
+        """True once every eager model is loaded; lazy models never block readiness."""
+        return all(slot.state == READY for slot in self._slots.values() if not slot.lazy)
+
+    def status(self) -> dict:
+        return {name: slot.status() for name, slot in self._slots.items()}
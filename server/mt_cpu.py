@@ -0,0 +1,163 @@
+"""CPU inference mode for the IndicTrans translation model.
+
+On CPU-only hosts the seq2seq model is the largest per-request cost. This
+module pins torch's intra-op and inter-op thread pools for each worker,
+applies dynamic int8 quantization to the ``nn.Linear`` layers and can
+optionally wrap the forward pass with ``torch.compile``. A startup
+self-check translates a fixed sentence set with the eager fp32 model and
+with the optimized one (int8, compiled, or both) and falls back to eager
+fp32 if the outputs drift too far or the optimized model fails to run.
+
+Settings (all optional):
+
+* ``MT_CPU_MODE`` - ``fp32`` (default) or ``int8``
+* ``MT_INTRA_OP_THREADS`` / ``MT_INTER_OP_THREADS`` - torch thread counts
+* ``MT_TORCH_COMPILE`` - ``true`` to ``torch.compile`` the forward pass
+* ``MT_SELF_CHECK_MIN_SIMILARITY`` - minimum mean similarity to fp32 (0.85)
+"""
+import difflib
+import logging
+import os
+import time
+from typing import List
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Fixed sentence set used to compare the optimized model against fp32
+SELF_CHECK_SENTENCES = [
+    "Hello, how are you?",
+    "The weather is very pleasant today.",
+    "Please send me the report by tomorrow morning.",
+    "Where is the nearest railway station?",
+    "Thank you for your help with the project.",
+]
+
+
+def configure_threads():
+    """Apply MT_INTRA_OP_THREADS / MT_INTER_OP_THREADS to this process."""
+    intra_op = os.environ.get("MT_INTRA_OP_THREADS")
+    inter_op = os.environ.get("MT_INTER_OP_THREADS")
+    if intra_op:
+        torch.set_num_threads(int(intra_op))
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(int(inter_op))
+        except RuntimeError as e:
+            # Can only be set before the first inter-op parallel work starts
+            logger.warning(f"Could not set inter-op threads: {e}")
+    print(f"Torch threads: intra-op={torch.get_num_threads()}, inter-op={torch.get_num_interop_threads()}")
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Return a copy of ``model`` with dynamic int8 ``nn.Linear`` layers."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def compile_forward(model: torch.nn.Module) -> torch.nn.Module:
+    """Wrap the forward pass with ``torch.compile`` when it is available."""
+    if not hasattr(torch, "compile"):
+        logger.warning("torch.compile is not available in this torch version")
+        return model
+    try:
+        model.forward = torch.compile(model.forward, dynamic=True)
+    except Exception as e:
+        logger.warning(f"torch.compile failed, using eager mode: {e}")
+    return model
+
+
+def _translate(model, tokenizer, sentences: List[str], target_lang: str) -> List[str]:
+    inputs = tokenizer(sentences, return_tensors="pt", padding=True)
+    with torch.no_grad():
+        output = model.generate(
+            **inputs,
+            max_length=64,
+            num_beams=1,
+            do_sample=False,
+            forced_bos_token_id=tokenizer.lang_code_to_id[target_lang]
+        )
+    return tokenizer.batch_decode(output, skip_special_tokens=True)
+
+
+def reference_outputs(model, tokenizer, target_lang: str = "hi") -> dict:
+    """Translate the self-check sentences with the eager fp32 ``model``."""
+    start = time.time()
+    outputs = _translate(model, tokenizer, SELF_CHECK_SENTENCES, target_lang)
+    return {"outputs": outputs, "seconds": round(time.time() - start, 3), "target_lang": target_lang}
+
+
+def self_check(reference: dict, candidate, tokenizer) -> dict:
+    """Compare ``candidate`` outputs with ``reference_outputs`` of the fp32 model."""
+    expected = reference["outputs"]
+    start = time.time()
+    actual = _translate(candidate, tokenizer, SELF_CHECK_SENTENCES, reference["target_lang"])
+    candidate_seconds = time.time() - start
+
+    similarities = [
+        difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(expected, actual)
+    ]
+    return {
+        "exact_matches": sum(a == b for a, b in zip(expected, actual)),
+        "sentences": len(SELF_CHECK_SENTENCES),
+        "mean_similarity": sum(similarities) / len(similarities),
+        "reference_seconds": reference["seconds"],
+        "candidate_seconds": round(candidate_seconds, 3),
+    }
+
+
+def _restore_eager(model: torch.nn.Module):
+    # compile_forward patches the instance; dropping it restores the class forward
+    if "forward" in vars(model):
+        del model.forward
+
+
+def prepare_cpu_model(model: torch.nn.Module, tokenizer) -> torch.nn.Module:
+    """Optimize an fp32 CPU model according to the MT_* settings.
+
+    Returns the optimized model, or the original eager one if the mode is
+    ``fp32`` without ``torch.compile`` or the self-check fails. The fp32
+    reference outputs are taken before anything is changed, because
+    ``torch.compile`` in fp32 mode patches ``model`` itself.
+    """
+    mode = os.environ.get("MT_CPU_MODE", "fp32").lower()
+    use_compile = os.environ.get("MT_TORCH_COMPILE", "false").lower() in ("true", "1", "yes")
+    min_similarity = float(os.environ.get("MT_SELF_CHECK_MIN_SIMILARITY", "0.85"))
+
+    if mode == "fp32" and not use_compile:
+        return model
+    if mode not in ("fp32", "int8"):
+        raise ValueError(f"Unknown MT_CPU_MODE '{mode}'. Use 'fp32' or 'int8'.")
+
+    print(f"Preparing CPU translation model (mode={mode}, torch.compile={use_compile})")
+    reference = reference_outputs(model, tokenizer)
+    candidate = quantize_int8(model) if mode == "int8" else model
+    if use_compile:
+        candidate = compile_forward(candidate)
+    candidate.eval()
+
+    if candidate is model and "forward" not in vars(model):
+        # torch.compile was unavailable or failed, nothing changed
+        print("CPU model self-check skipped: model is unchanged fp32")
+        return model
+
+    label = f"{mode}{'+compile' if use_compile else ''}"
+    try:
+        report = self_check(reference, candidate, tokenizer)
+    except Exception as e:
+        logger.warning(f"Optimized model ({label}) failed the self-check: {e}; falling back to eager fp32")
+        _restore_eager(model)
+        return model
+    print(
+        f"CPU model self-check: {report['exact_matches']}/{report['sentences']} exact, "
+        f"similarity {report['mean_similarity']:.3f}, "
+        f"{report['reference_seconds']}s fp32 vs {report['candidate_seconds']}s {label}"
+    )
+    if report["mean_similarity"] < min_similarity:
+        logger.warning(
+            f"Optimized model ({label}) drifted from fp32 (similarity {report['mean_similarity']:.3f} "
+            f"< {min_similarity}); falling back to eager fp32"
+        )
+        _restore_eager(model)
+        return model
+    return candidate
@@ -0,0 +1,125 @@
+"""Static phrasebook served before the translation model.
+
+Greetings and UI phrases make up a large share of translation traffic and
+always translate the same way. The phrasebook is loaded once from a JSON
+data file shaped like::
+
+    {"en-hi": {"hello": "नमस्ते", "thank you": "धन्यवाद"}, "hi-en": {...}}
+
+and compiled into an immutable index keyed by language pair and normalized
+phrase, so each lookup is a single dict access. Case, surrounding quotes,
+whitespace and trailing punctuation are handled by ``normalize_phrase``,
+which is used both when the index is built and when it is queried; a
+trailing ``.``, ``?`` or ``!`` on the query is re-applied to the result
+(as a danda for languages that use one).
+"""
+import json
+import logging
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n\"'“”‘’«»()[]"
+_TERMINAL_PUNCTUATION = ".?!।॥,;:"
+
+# Target languages that end a sentence with a danda instead of a period
+DANDA_LANGUAGES = frozenset({"as", "bn", "hi", "ne", "or", "pa", "sa"})
+
+
+def normalize_phrase(text: str) -> Tuple[str, str]:
+    """Return ``(key, terminal)`` for a phrase.
+
+    ``key`` is the NFC, case-folded, whitespace-collapsed phrase without
+    surrounding quotes or trailing punctuation; ``terminal`` is the
+    sentence-ending mark that was stripped (``"."``, ``"?"``, ``"!"`` or
+    ``""``).
+    """
+    text = unicodedata.normalize("NFC", text).strip(_EDGE_PUNCTUATION)
+    stripped = text.rstrip(_TERMINAL_PUNCTUATION + _EDGE_PUNCTUATION)
+    tail = text[len(stripped):]
+    terminal = ""
+    for mark in ("?", "!"):
+        if mark in tail:
+            terminal = mark
+            break
+    else:
+        if "." in tail or "।" in tail or "॥" in tail:
+            terminal = "."
+    key = _WHITESPACE_RE.sub(" ", stripped.strip(_EDGE_PUNCTUATION)).casefold()
+    return key, terminal
+
+
+def _with_terminal(translation: str, terminal: str, target_lang: str) -> str:
+    if not terminal:
+        return translation
+    if terminal == "." and target_lang in DANDA_LANGUAGES:
+        terminal = "।"
+    return translation + terminal
+
+
+class Phrasebook:
+    """Immutable ``(source, target, phrase) -> translation`` index."""
+
+    def __init__(self, entries: Mapping[str, Mapping[str, str]]):
+        index = {}
+        for pair, phrases in entries.items():
+            source_lang, _, target_lang = pair.partition("-")
+            if not source_lang or not target_lang:
+                raise ValueError(f"Phrasebook pair '{pair}' must look like 'en-hi'")
+            compiled = {}
+            for phrase, translation in phrases.items():
+                key, _ = normalize_phrase(phrase)
+                translation = translation.strip()
+                if key and translation:
+                    compiled[key] = translation
+            index[(source_lang.lower(), target_lang.lower())] = MappingProxyType(compiled)
+        self._index = MappingProxyType(index)
+
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    @classmethod
+    def from_file(cls, path: Path) -> "Phrasebook":
+        """Load a phrasebook, or an empty one if the file does not exist."""
+        path = Path(path)
+        if not path.exists():
+            logger.warning(f"Phrasebook {path} not found, starting with an empty phrasebook")
+            return cls({})
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def lookup(self, text: str, source_lang: str, target_lang: str) -> Optional[str]:
+        """Return the phrasebook translation of ``text``, or None."""
+        phrases = self._index.get((source_lang, target_lang))
+        result = None
+        if phrases:
+            key, terminal = normalize_phrase(text)
+            translation = phrases.get(key)
+            if translation is not None:
+                result = _with_terminal(translation, terminal, target_lang)
+        with self._lock:
+            self.lookups += 1
+            if result is not None:
+                self.hits += 1
+        return result
+
+    def __len__(self) -> int:
+        return sum(len(phrases) for phrases in self._index.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups, hits = self.lookups, self.hits
+        return {
+            "pairs": sorted(f"{src}-{tgt}" for src, tgt in self._index),
+            "phrases": len(self),
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
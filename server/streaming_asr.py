@@ -0,0 +1,158 @@
+"""Incremental audio decoding and windowing for streaming transcription.
+
+The WebSocket endpoint feeds client frames into a stream decoder, which
+turns them into 16 kHz mono float32 samples, and appends those samples to a
+``RollingAudioBuffer``. The buffer decides when enough new audio has
+arrived to emit a partial hypothesis for the current window, and when the
+window is full and should be finalized and reset.
+"""
+import logging
+import subprocess
+import threading
+from typing import Optional
+
+import numpy as np
+
+from audio_decode import SAMPLE_RATE, pcm16_to_float32
+
+logger = logging.getLogger(__name__)
+
+
+class PCMStreamDecoder:
+    """Pass-through decoder for raw 16 kHz mono s16le frames."""
+
+    def __init__(self):
+        self._remainder = b""
+
+    def feed(self, data: bytes) -> np.ndarray:
+        data = self._remainder + data
+        # Keep an odd trailing byte until the next frame completes the sample
+        usable = len(data) - (len(data) % 2)
+        self._remainder = data[usable:]
+        return pcm16_to_float32(data[:usable])
+
+    def close(self) -> np.ndarray:
+        self._remainder = b""
+        return np.zeros(0, dtype=np.float32)
+
+
+class FFmpegStreamDecoder:
+    """Decode a compressed stream (webm/ogg Opus, etc.) with one long-lived ffmpeg.
+
+    Frames are written to ffmpeg's stdin as they arrive; a reader thread
+    collects the PCM it produces on stdout so ``feed`` never blocks on it.
+    """
+
+    def __init__(self, input_format: Optional[str] = None):
+        cmd = ['ffmpeg', '-loglevel', 'error', '-fflags', '+genpts']
+        if input_format:
+            cmd += ['-f', input_format]
+        cmd += ['-i', 'pipe:0', '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1']
+        self._process = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self._lock = threading.Lock()
+        self._output = bytearray()
+        self._reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self._reader.start()
+
+    def _read_stdout(self):
+        while True:
+            chunk = self._process.stdout.read1(65536)
+            if not chunk:
+                break
+            with self._lock:
+                self._output.extend(chunk)
+
+    def _take(self) -> np.ndarray:
+        with self._lock:
+            usable = len(self._output) - (len(self._output) % 2)
+            data = bytes(self._output[:usable])
+            del self._output[:usable]
+        return pcm16_to_float32(data)
+
+    def feed(self, data: bytes) -> np.ndarray:
+        try:
+            self._process.stdin.write(data)
+            self._process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            logger.warning("ffmpeg stream decoder closed its input early")
+        return self._take()
+
+    def close(self) -> np.ndarray:
+        """Flush ffmpeg and return any remaining samples."""
+        if self._process.poll() is None:
+            try:
+                self._process.stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._reader.join(timeout=5)
+        return self._take()
+
+
+def create_stream_decoder(audio_format: str):
+    """Return a decoder for the ``format`` requested by the client."""
+    audio_format = audio_format.lower()
+    if audio_format in ("pcm", "pcm16", "s16le"):
+        return PCMStreamDecoder()
+    if audio_format in ("webm", "ogg", "opus"):
+        return FFmpegStreamDecoder("ogg" if audio_format == "opus" else audio_format)
+    raise ValueError(f"Unsupported stream format '{audio_format}'. Use pcm16, webm, ogg or opus.")
+
+
+class RollingAudioBuffer:
+    """Holds the audio of the segment currently being transcribed.
+
+    ``ready`` returns ``"final"`` once the window is full, ``"partial"`` once
+    at least ``step_seconds`` of new audio arrived since the last hypothesis,
+    and ``None`` otherwise.
+    """
+
+    def __init__(self, window_seconds: float = 8.0, step_seconds: float = 1.0, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.window_samples = int(window_seconds * sample_rate)
+        self.step_samples = max(1, int(step_seconds * sample_rate))
+        self._chunks = []
+        self._length = 0
+        self._hypothesis_length = 0
+        # Start time, in seconds, of the current window within the stream
+        self.offset = 0.0
+
+    def append(self, samples: np.ndarray):
+        if samples.size:
+            self._chunks.append(samples)
+            self._length += samples.size
+
+    def __len__(self) -> int:
+        return self._length
+
+    def ready(self) -> Optional[str]:
+        if self._length >= self.window_samples:
+            return "final"
+        if self._length - self._hypothesis_length >= self.step_samples:
+            return "partial"
+        return None
+
+    def window(self) -> np.ndarray:
+        """Return the current window's audio and mark it as transcribed."""
+        if len(self._chunks) > 1:
+            self._chunks = [np.concatenate(self._chunks)]
+        self._hypothesis_length = self._length
+        return self._chunks[0][:self.window_samples] if self._chunks else np.zeros(0, dtype=np.float32)
+
+    @property
+    def duration(self) -> float:
+        return min(self._length, self.window_samples) / self.sample_rate
+
+    def commit(self):
+        """Finalize the current window and carry over any audio beyond it."""
+        audio = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.float32)
+        carry = audio[self.window_samples:]
+        self.offset += min(audio.size, self.window_samples) / self.sample_rate
+        self._chunks = [carry] if carry.size else []
+        self._length = carry.size
+        self._hypothesis_length = 0
@@ -0,0 +1,332 @@
+"""Bounded, size-aware LRU cache for translation results.
+
+All translation lookups go through ``TranslationCache`` so keys are built
+one way (``make_key``) regardless of whether the entry is a whole request,
+a chunk or a phrase. Entries are evicted in least-recently-used order once
+either the entry count or the total byte size exceeds its limit. Misses are
+never stored.
+
+An optional ``PersistentTranslationStore`` adds a shared SQLite tier behind
+the in-memory cache: lookups read through to it and new translations are
+written behind by a background thread, so every worker process and every
+restart starts from a warm cache.
+"""
+import hashlib
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping overhead (OrderedDict node, key and str headers)
+ENTRY_OVERHEAD_BYTES = 200
+
+# The writer thread waits this long for the database lock
+WRITE_TIMEOUT_MS = 5000
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before it is used as part of a cache key."""
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def make_key(text: str, source_lang: str, target_lang: str) -> str:
+    """Build the cache key for a text and language pair."""
+    digest = hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{source_lang}:{target_lang}:{digest}"
+
+
+def model_revision(model_dir: Path, files: Iterable[str] = ("config.json", "generation_config.json")) -> str:
+    """Derive a revision id for a local model from its config files."""
+    digest = hashlib.sha1()
+    for name in files:
+        path = Path(model_dir) / name
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+class PersistentTranslationStore:
+    """SQLite-backed translation store shared across processes and restarts.
+
+    Keys are the ``make_key`` key prefixed with the model revision, so a new
+    model never serves translations produced by an older one. The revision
+    is usually only known once the model has loaded; until ``set_revision``
+    is called every lookup misses and nothing is written. Reads are
+    synchronous point lookups with a short busy timeout
+    (``read_timeout_ms``), so a reader on the event loop treats a locked
+    database as a miss instead of blocking; writes are queued and flushed in
+    batches by a daemon thread that waits up to 5 s for the lock. SQLite
+    runs in WAL mode so several uvicorn workers can share the same file.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        revision: Optional[str] = None,
+        flush_interval: float = 0.5,
+        flush_batch: int = 256,
+        read_timeout_ms: int = 20,
+    ):
+        self.path = Path(path)
+        self.revision = revision
+        self.read_timeout_ms = max(0, read_timeout_ms)
+        self.flush_interval = flush_interval
+        self.flush_batch = max(1, flush_batch)
+        self._local = threading.local()
+        self._pending: "queue.Queue" = queue.Queue()
+        self._closed = False
+
+        # Metrics
+        self.reads = 0
+        self.hits = 0
+        self.writes = 0
+        self.contended = 0
+        self.errors = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection(WRITE_TIMEOUT_MS)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.commit()
+
+        self._start_writer()
+        # Threads and SQLite handles do not survive fork(); when workers are
+        # forked from a preloaded master, give each child its own
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _start_writer(self):
+        self._writer = threading.Thread(target=self._write_loop, name="translation-cache-writer", daemon=True)
+        self._writer.start()
+
+    def _reset_after_fork(self):
+        self._local = threading.local()
+        self._pending = queue.Queue()
+        if not self._closed:
+            self._start_writer()
+
+    def _connection(self, busy_timeout_ms: int) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; reads come from the event loop
+        # and the MT pool while writes come from the writer thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=busy_timeout_ms / 1000.0)
+            conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def set_revision(self, revision: str):
+        """Set the model revision once the model is loaded."""
+        if revision != self.revision:
+            logger.info(f"Persistent translation cache using model revision {revision}")
+        self.revision = revision
+
+    def _store_key(self, key: str) -> str:
+        return f"{self.revision}:{key}"
+
+    def get(self, key: str) -> Optional[str]:
+        if self.revision is None:
+            return None
+        self.reads += 1
+        try:
+            row = self._connection(self.read_timeout_ms).execute(
+                "SELECT value FROM translations WHERE key = ?", (self._store_key(key),)
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                self.errors += 1
+                logger.warning(f"Persistent translation cache read failed: {e}")
+            else:
+                # Another worker holds the lock; a miss is cheaper than waiting
+                self.contended += 1
+            return None
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Persistent translation cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, value: str):
+        """Queue a translation to be written behind."""
+        if not self._closed and self.revision is not None:
+            self._pending.put((self._store_key(key), value))
+
+    def _drain(self, first) -> list:
+        rows = [first]
+        while len(rows) < self.flush_batch:
+            try:
+                item = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._pending.put(None)
+                break
+            rows.append(item)
+        return rows
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            # Give concurrent writers a moment to accumulate a batch
+            time.sleep(self.flush_interval)
+            rows = self._drain(item)
+            now = time.time()
+            try:
+                conn = self._connection(WRITE_TIMEOUT_MS)
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO translations (key, value, updated) VALUES (?, ?, ?)",
+                        [(key, value, now) for key, value in rows],
+                    )
+                self.writes += len(rows)
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning(f"Persistent translation cache write of {len(rows)} rows failed: {e}")
+
+    def close(self):
+        """Flush pending writes and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.put(None)
+        self._writer.join(timeout=10)
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.path),
+            "revision": self.revision,
+            "reads": self.reads,
+            "hits": self.hits,
+            "contended": self.contended,
+            "writes": self.writes,
+            "pending_writes": self._pending.qsize(),
+            "errors": self.errors,
+        }
+
+
+class TranslationCache:
+    """Thread-safe LRU cache bounded by entry count and total bytes.
+
+    If ``store`` is given, memory misses read through to it and every
+    ``put`` is also written behind to it.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        store: Optional[PersistentTranslationStore] = None,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.store = store
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_size(key: str, value: str) -> int:
+        return len(key) + len(value.encode("utf-8")) + ENTRY_OVERHEAD_BYTES
+
+    def get(self, text: str, source_lang: str, target_lang: str) -> Optional[str]:
+        key = make_key(text, source_lang, target_lang)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self._insert(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, source_lang: str, target_lang: str, value: Optional[str]):
+        """Store a translation. Empty results are ignored so misses are never memoized."""
+        if not value:
+            return
+        key = make_key(text, source_lang, target_lang)
+        self._insert(key, value)
+        if self.store is not None:
+            self.store.put(key, value)
+
+    def _insert(self, key: str, value: str):
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._sizes[key]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self.total_bytes += size
+
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+        if self.store is not None:
+            stats["persistent"] = self.store.stats()
+        return stats
@@ -0,0 +1,418 @@
+"""Pluggable text-to-speech backends.
+
+Every backend writes one clip for ``(text, language, voice, speed)`` to a
+file, so the endpoints and the TTS cache do not care which engine
+produced it.
+
+* ``piper`` - local VITS voices (ONNX) run on the CPU by piper-tts. Voices
+  are ``.onnx`` files in ``TTS_PIPER_DIR`` whose names start with the
+  language code, e.g. ``hi_IN-pratham-medium.onnx``.
+* ``espeak-ng`` - formant synthesis through the ``espeak-ng`` binary. Less
+  natural but tiny, always local, and it covers every supported language.
+* ``gtts`` - Google Translate TTS. Sends the text to Google, so it comes
+  last, after the local engines, and is never used in ``OFFLINE_MODE``.
+
+``TTSRouter`` picks the first available backend that supports a language,
+in the order given by ``TTS_BACKENDS``; ``TTS_LANGUAGE_BACKENDS`` (e.g.
+``"hi=piper,ta=espeak-ng"``) pins a backend for specific languages.
+Backends write their native format; ``synthesize_as`` transcodes with
+ffmpeg so clients always get the one format set by ``TTS_OUTPUT_FORMAT``.
+"""
+import io
+import logging
+import os
+import re
+import shutil
+import struct
+import subprocess
+import threading
+import wave
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from model_registry import ModelConfigurationError
+
+logger = logging.getLogger(__name__)
+
+# Languages exposed by the /tts/ endpoints
+LANGUAGE_NAMES = {
+    'en': 'English',
+    'hi': 'Hindi',
+    'ta': 'Tamil',
+    'te': 'Telugu',
+    'ml': 'Malayalam',
+    'bn': 'Bengali',
+    'mr': 'Marathi',
+    'gu': 'Gujarati',
+    'kn': 'Kannada',
+    'pa': 'Punjabi',
+    'ur': 'Urdu',
+}
+
+# Output formats clients can be served, by file suffix
+AUDIO_MEDIA_TYPES = {".mp3": "audio/mp3", ".wav": "audio/wav"}
+
+# espeak-ng voice variants such as "+f3" appended to a voice name
+_ESPEAK_VARIANT_RE = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+class TTSBackend:
+    """Base class; subclasses set the class attributes and ``synthesize``."""
+
+    name = ""
+    suffix = ".wav"
+    media_type = "audio/wav"
+    online = False
+
+    def supports(self, language: str) -> bool:
+        return language in self.languages()
+
+    def languages(self) -> List[str]:
+        return list(LANGUAGE_NAMES)
+
+    def resolve_voice(self, language: str, voice: Optional[str]) -> str:
+        """Return the concrete voice id used for ``language``.
+
+        Raises ``ValueError`` for a voice the backend does not offer, so a
+        client can never pass arbitrary values through to the engine.
+        """
+        return voice or language
+
+    def synthesize(self, text: str, language: str, voice: Optional[str], speed: float, output_path: str):
+        raise NotImplementedError
+
+
+# Google Translate domains gTTS may use as accents. The voice becomes the
+# host gTTS connects to, so only these values are accepted.
+GTTS_TLDS = ("com", "co.in", "co.uk", "com.au", "ca", "co.za", "ie", "us")
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS; ``voice`` is the accent domain, e.g. ``co.in``."""
+
+    name = "gtts"
+    suffix = ".mp3"
+    media_type = "audio/mp3"
+    online = True
+
+    def __init__(self):
+        from gtts import gTTS
+
+        self._gtts = gTTS
+
+    def resolve_voice(self, language: str, voice: Optional[str]) -> str:
+        if voice is None:
+            return "com"
+        if voice not in GTTS_TLDS:
+            raise ValueError(f"Unknown gtts voice '{voice}'. Use one of {list(GTTS_TLDS)}.")
+        return voice
+
+    def synthesize(self, text: str, language: str, voice: Optional[str], speed: float, output_path: str):
+        # gTTS only distinguishes normal and slow speech
+        tts = self._gtts(text=text, lang=language, tld=self.resolve_voice(language, voice), slow=speed < 1.0)
+        tts.save(output_path)
+
+
+class EspeakBackend(TTSBackend):
+    """espeak-ng command line synthesizer."""
+
+    name = "espeak-ng"
+    base_wpm = 160
+
+    def __init__(self, binary: str = "espeak-ng"):
+        self.binary = shutil.which(binary)
+        if self.binary is None:
+            raise RuntimeError(f"{binary} is not installed (apt-get install espeak-ng)")
+        self.voices = self._list_voices() or set(LANGUAGE_NAMES)
+
+    def _list_voices(self) -> set:
+        """Language codes, voice names and voice files known to this espeak-ng."""
+        try:
+            result = subprocess.run([self.binary, "--voices"], capture_output=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"Could not list espeak-ng voices: {e}")
+            return set()
+        voices = set()
+        # Columns: Pty Language Age/Gender VoiceName File Other Languages
+        for line in result.stdout.decode("utf-8", "replace").splitlines()[1:]:
+            parts = line.split()
+            if len(parts) >= 5:
+                voices.update((parts[1], parts[3], parts[4]))
+        return voices
+
+    def resolve_voice(self, language: str, voice: Optional[str]) -> str:
+        if voice is None:
+            return language
+        name, _, variant = voice.partition("+")
+        if name not in self.voices or (variant and not _ESPEAK_VARIANT_RE.match(variant)):
+            raise ValueError(f"Unknown espeak-ng voice '{voice}'")
+        return voice
+
+    def synthesize(self, text: str, language: str, voice: Optional[str], speed: float, output_path: str):
+        wpm = max(80, int(self.base_wpm * speed))
+        result = subprocess.run(
+            [self.binary, "-v", self.resolve_voice(language, voice), "-s", str(wpm), "-w", output_path, "--stdin"],
+            input=text.encode("utf-8"),
+            capture_output=True,
+            timeout=60,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"espeak-ng failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+
+
+class PiperBackend(TTSBackend):
+    """Piper VITS voices running on onnxruntime."""
+
+    name = "piper"
+
+    def __init__(self, voices_dir: Path):
+        try:
+            from piper.voice import PiperVoice
+        except ImportError as e:
+            raise RuntimeError("The piper backend requires the piper-tts package (pip install piper-tts)") from e
+
+        self._piper_voice = PiperVoice
+        self.voices_dir = Path(voices_dir)
+        # language -> {voice name: model path}; the first voice is the default
+        self.voices: Dict[str, Dict[str, Path]] = {}
+        for model_path in sorted(self.voices_dir.glob("*.onnx")):
+            language = model_path.stem.split("_")[0].split("-")[0].lower()
+            self.voices.setdefault(language, {})[model_path.stem] = model_path
+        if not self.voices:
+            raise RuntimeError(f"No Piper voices (*.onnx) found in {self.voices_dir}")
+
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def languages(self) -> List[str]:
+        return [language for language in LANGUAGE_NAMES if language in self.voices]
+
+    def resolve_voice(self, language: str, voice: Optional[str]) -> str:
+        voices = self.voices[language]
+        if voice is None:
+            return next(iter(voices))
+        if voice not in voices:
+            raise ValueError(f"Unknown piper voice '{voice}' for '{language}'. Use one of {list(voices)}.")
+        return voice
+
+    def _voice(self, name: str, model_path: Path):
+        # Voices are loaded on first use and kept for the life of the process
+        with self._lock:
+            if name not in self._loaded:
+                self._loaded[name] = self._piper_voice.load(str(model_path))
+            return self._loaded[name]
+
+    def synthesize(self, text: str, language: str, voice: Optional[str], speed: float, output_path: str):
+        name = self.resolve_voice(language, voice)
+        piper_voice = self._voice(name, self.voices[language][name])
+        length_scale = 1.0 / max(speed, 0.1)
+        with wave.open(output_path, "wb") as wav_file:
+            if hasattr(piper_voice, "synthesize_wav"):
+                # piper-tts >= 1.3
+                from piper import SynthesisConfig
+
+                piper_voice.synthesize_wav(text, wav_file, syn_config=SynthesisConfig(length_scale=length_scale))
+            else:
+                piper_voice.synthesize(text, wav_file, length_scale=length_scale)
+
+
+def transcode(input_path: str, output_path: str, suffix: str):
+    """Convert an audio file to the format of ``suffix`` with ffmpeg."""
+    audio_format = suffix.lstrip(".")
+    result = subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-y", "-i", input_path, "-f", audio_format, output_path],
+        capture_output=True,
+        timeout=60,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not convert speech to {audio_format}: "
+                           f"{result.stderr.decode('utf-8', 'replace').strip()}")
+
+
+def synthesize_as(backend: TTSBackend, text: str, language: str, voice: Optional[str], speed: float,
+                  output_path: str, suffix: str):
+    """Synthesize with ``backend`` and write the clip in the format of ``suffix``."""
+    if backend.suffix == suffix:
+        backend.synthesize(text, language, voice, speed, output_path)
+        return
+    # A sibling of the cache's temp file, so it shares its cleanup prefix
+    native_path = output_path + backend.suffix
+    try:
+        backend.synthesize(text, language, voice, speed, native_path)
+        transcode(native_path, output_path, suffix)
+    finally:
+        Path(native_path).unlink(missing_ok=True)
+
+
+# Layer III bitrates (kbit/s) by bitrate index, and sample rates by MPEG version
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_frame(data: bytes, offset: int):
+    """Return ``(length, xing_offset)`` of the Layer III frame at ``offset``, or None."""
+    if len(data) < offset + 4 or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[offset + 1] >> 3) & 3
+    layer = (data[offset + 1] >> 1) & 3
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (data[offset + 2] >> 1) & 1
+    length = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+    mono = data[offset + 3] >> 6 == 3
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    return length, offset + 4 + side_info
+
+
+def strip_mp3_headers(data: bytes) -> bytes:
+    """Return just the audio frames of an mp3 file.
+
+    Drops the ID3v2 and ID3v1 tags and a leading Xing/Info/VBRI frame, so
+    clips can follow each other in one stream without a player reading the
+    first clip's length as the length of the whole stream.
+    """
+    start, end = 0, len(data)
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    frame = _mp3_frame(data, start)
+    if frame is not None:
+        length, xing_offset = frame
+        if data[xing_offset:xing_offset + 4] in (b"Xing", b"Info") or data[start + 36:start + 40] == b"VBRI":
+            start += length
+    return data[start:end]
+
+
+def read_mp3_frames(path: str) -> bytes:
+    """Read an mp3 file without its tags and VBR header (see ``strip_mp3_headers``)."""
+    return strip_mp3_headers(Path(path).read_bytes())
+
+
+def read_wav_pcm(path: str):
+    """Return ``(channels, sample_width, sample_rate, pcm_bytes)`` for a WAV file."""
+    with wave.open(path, "rb") as wav_file:
+        return (
+            wav_file.getnchannels(),
+            wav_file.getsampwidth(),
+            wav_file.getframerate(),
+            wav_file.readframes(wav_file.getnframes()),
+        )
+
+
+def concat_audio(paths: List[str], suffix: str) -> bytes:
+    """Join clips from one backend into a single file's bytes."""
+    if suffix != ".wav":
+        # mp3 frames can follow each other once each clip's tags and VBR
+        # header are gone; otherwise players stop after the first clip
+        return b"".join(read_mp3_frames(path) for path in paths)
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav_out:
+        for index, path in enumerate(paths):
+            channels, sample_width, sample_rate, pcm = read_wav_pcm(path)
+            if index == 0:
+                wav_out.setnchannels(channels)
+                wav_out.setsampwidth(sample_width)
+                wav_out.setframerate(sample_rate)
+            wav_out.writeframes(pcm)
+    return output.getvalue()
+
+
+def streaming_wav_header(channels: int, sample_width: int, sample_rate: int) -> bytes:
+    """A WAV header for a PCM stream of unknown length.
+
+    The RIFF and data sizes are set to the maximum value, which players
+    treat as "read until the stream ends".
+    """
+    unknown = 0xFFFFFFFF
+    return (
+        b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+        + b"fmt " + struct.pack(
+            "<IHHIIHH", 16, 1, channels, sample_rate,
+            sample_rate * channels * sample_width, channels * sample_width, sample_width * 8
+        )
+        + b"data" + struct.pack("<I", unknown)
+    )
+
+
+BACKEND_FACTORIES = {
+    "piper": lambda: PiperBackend(Path(os.environ.get("TTS_PIPER_DIR", "models/piper"))),
+    "espeak-ng": EspeakBackend,
+    "gtts": GTTSBackend,
+}
+
+
+class TTSRouter:
+    """Chooses a backend per language from an ordered list of backends."""
+
+    def __init__(self, backends: List[TTSBackend], language_backends: Optional[Dict[str, str]] = None):
+        if not backends:
+            # Retrying will not install an engine, so fail for good
+            raise ModelConfigurationError(
+                "No TTS backend is available: install piper-tts voices or espeak-ng, "
+                "or list gtts in TTS_BACKENDS with OFFLINE_MODE off"
+            )
+        self.backends = backends
+        self.language_backends = language_backends or {}
+
+    def backend_for(self, language: str) -> Optional[TTSBackend]:
+        pinned = self.language_backends.get(language)
+        for backend in self.backends:
+            if pinned and backend.name != pinned:
+                continue
+            if backend.supports(language):
+                return backend
+        return None
+
+    def languages(self) -> List[str]:
+        return [language for language in LANGUAGE_NAMES if self.backend_for(language) is not None]
+
+    def describe(self) -> Dict[str, str]:
+        """Map each supported language to the backend that serves it."""
+        return {language: self.backend_for(language).name for language in self.languages()}
+
+
+def load_tts_router(offline: bool = False) -> TTSRouter:
+    """Create the backends selected by the environment.
+
+    ``TTS_BACKENDS`` is a comma-separated preference order (default
+    ``piper,espeak-ng,gtts``: the local engines first, Google as the last
+    fallback). ``gtts`` is skipped when ``offline`` is true. Backends that
+    cannot start (missing package, binary or voices) are skipped with a
+    warning.
+    """
+    order = [
+        name.strip().lower()
+        for name in os.environ.get("TTS_BACKENDS", "piper,espeak-ng,gtts").split(",")
+        if name.strip()
+    ]
+    language_backends = {}
+    for item in os.environ.get("TTS_LANGUAGE_BACKENDS", "").split(","):
+        language, sep, name = item.partition("=")
+        if sep:
+            language_backends[language.strip().lower()] = name.strip().lower()
+
+    backends = []
+    for name in order:
+        if name not in BACKEND_FACTORIES:
+            raise ValueError(f"Unknown TTS backend '{name}'. Use one of {list(BACKEND_FACTORIES)}.")
+        if offline and name == "gtts":
+            print("Skipping TTS backend 'gtts' in offline mode")
+            continue
+        try:
+            backends.append(BACKEND_FACTORIES[name]())
+        except Exception as e:
+            logger.warning(f"TTS backend '{name}' is unavailable: {e}")
+
+    router = TTSRouter(backends, language_backends)
+    print(f"TTS backends by language: {router.describe()}")
+    return router
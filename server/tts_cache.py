@@ -0,0 +1,192 @@
+"""Content-addressed on-disk cache for synthesized speech.
+
+Each clip is stored under the SHA-256 of ``(text, language, voice, speed)``,
+so the same prompt is synthesized once and then served from disk. Clips
+are written to a temporary file next to the cache and moved into place
+with ``os.replace``, so readers never see a partial file. Once the total
+size or entry count exceeds its limit, the least recently used clips are
+deleted.
+
+The LRU order is kept in memory and rebuilt from file access times at
+startup. Worker processes sharing the directory each keep their own view,
+so the limits are approximate when several workers write at once.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TMP_PREFIX = ".tmp-"
+
+
+def make_tts_key(text: str, language: str, voice: Optional[str] = None, speed: float = 1.0) -> str:
+    """Build the content address of a clip."""
+    payload = json.dumps([text, language, voice or "", round(float(speed), 3)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Disk-backed LRU cache of audio files keyed by ``make_tts_key``."""
+
+    def __init__(self, root: Path, max_bytes: int = 512 * 1024 * 1024, max_entries: int = 20000):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._entries: "OrderedDict[str, Path]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.current_bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Index existing clips (oldest access first) and drop stale temp files."""
+        found = []
+        for path in self.root.glob("*/*"):
+            if path.name.startswith(TMP_PREFIX):
+                # Left behind by a synthesis that crashed mid-write
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_atime, path.stem, path, stat.st_size))
+        for _, key, path, size in sorted(found):
+            self._entries[key] = path
+            self._sizes[key] = size
+            self.current_bytes += size
+        self._evict()
+        if found:
+            print(f"TTS cache: {len(self._entries)} clips, {self.current_bytes / 1e6:.1f} MB in {self.root}")
+
+    def _evict(self):
+        # Never evict the most recent entry, it is about to be served
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes
+        ):
+            key, path = self._entries.popitem(last=False)
+            self.current_bytes -= self._sizes.pop(key, 0)
+            self.evictions += 1
+            path.unlink(missing_ok=True)
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the path of a cached clip and mark it recently used."""
+        path = self._get(key)
+        if path is not None:
+            self.hits += 1
+        return path
+
+    def _get(self, key: str) -> Optional[Path]:
+        with self._lock:
+            path = self._entries.get(key)
+            if path is None:
+                path = self._adopt(key)
+                if path is None:
+                    return None
+            elif not path.exists():
+                # Evicted by another worker sharing the directory
+                self._entries.pop(key)
+                self.current_bytes -= self._sizes.pop(key, 0)
+                return None
+            self._entries.move_to_end(key)
+        try:
+            # Record the access on disk so the LRU order survives restarts
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def _adopt(self, key: str) -> Optional[Path]:
+        # Pick up a clip written by another worker sharing the directory
+        for path in (self.root / key[:2]).glob(f"{key}.*"):
+            size = path.stat().st_size
+            self._entries[key] = path
+            self._sizes[key] = size
+            self.current_bytes += size
+            self._evict()
+            return path
+        return None
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_or_create(self, key: str, synthesize: Callable[[str], None], suffix: str = ".mp3") -> Path:
+        """Return the cached clip for ``key``, synthesizing it on a miss.
+
+        ``synthesize(path)`` must write the audio to ``path``. Concurrent
+        requests for the same key wait for a single synthesis.
+        """
+        path = self.get(key)
+        if path is not None:
+            return path
+
+        lock = self._key_lock(key)
+        with lock:
+            path = self.get(key)
+            if path is not None:
+                return path
+            self.misses += 1
+            try:
+                path = self._create(key, synthesize, suffix)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return path
+
+    def _create(self, key: str, synthesize: Callable[[str], None], suffix: str) -> Path:
+        start = time.time()
+        directory = self.root / key[:2]
+        directory.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=TMP_PREFIX, suffix=suffix, dir=directory)
+        os.close(fd)
+        try:
+            synthesize(tmp_path)
+            size = os.path.getsize(tmp_path)
+            if size == 0:
+                raise RuntimeError("TTS engine produced an empty file")
+            path = directory / f"{key}{suffix}"
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._sizes.get(key, 0)
+            self._entries[key] = path
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self.current_bytes += size
+            self._evict()
+        logger.info(f"TTS cache: stored {path.name} ({size} bytes) in {time.time() - start:.2f}s")
+        return path
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
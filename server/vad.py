@@ -0,0 +1,141 @@
+"""Energy-based voice activity detection ahead of Whisper.
+
+Push-to-talk clips are mostly silence, and Whisper's cost grows with the
+length of the audio it is given. ``trim_silence`` drops leading and
+trailing silence, shortens long pauses inside the clip, and reports
+whether any speech was found so callers can skip transcription entirely.
+
+Loudness alone cannot tell a steady fan or hiss from a voice, so every
+candidate speech segment must also rise ``min_dynamic_range_db`` above the
+noise floor and have a spectrum less flat than ``max_flatness`` (white
+noise is close to 0.56, voiced speech well below 0.3).
+"""
+import numpy as np
+
+from audio_decode import SAMPLE_RATE
+
+
+class VADResult:
+    """Trimmed audio plus statistics about what was dropped."""
+
+    def __init__(self, audio: np.ndarray, original_samples: int, sample_rate: int = SAMPLE_RATE):
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.original_seconds = original_samples / sample_rate
+        self.speech_seconds = audio.size / sample_rate
+
+    @property
+    def has_speech(self) -> bool:
+        return self.audio.size > 0
+
+    @property
+    def dropped_seconds(self) -> float:
+        return self.original_seconds - self.speech_seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "has_speech": self.has_speech,
+            "original_seconds": round(self.original_seconds, 3),
+            "speech_seconds": round(self.speech_seconds, 3),
+            "dropped_seconds": round(self.dropped_seconds, 3),
+        }
+
+
+def frame_energy_db(audio: np.ndarray, frame_samples: int) -> np.ndarray:
+    """Return the RMS level of each frame in dBFS."""
+    n_frames = audio.size // frame_samples
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_samples].reshape(n_frames, frame_samples)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+
+def frame_spectral_flatness(audio: np.ndarray, frame_samples: int) -> np.ndarray:
+    """Return the spectral flatness (geometric / arithmetic mean power) of each frame."""
+    n_frames = audio.size // frame_samples
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_samples].reshape(n_frames, frame_samples)
+    spectrum = np.fft.rfft(frames * np.hanning(frame_samples), axis=1)
+    power = np.square(np.abs(spectrum), dtype=np.float64)[:, 1:] + 1e-12
+    return np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+
+def _speech_runs(speech: np.ndarray):
+    """Yield ``(start, end)`` frame ranges of consecutive speech frames."""
+    edges = np.diff(np.concatenate([[0], speech.astype(np.int8), [0]]))
+    return zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+
+
+def trim_silence(
+    audio: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    frame_ms: int = 30,
+    threshold_db: float = -45.0,
+    noise_margin_db: float = 12.0,
+    padding_ms: int = 200,
+    max_pause_ms: int = 600,
+    min_speech_ms: int = 150,
+    min_dynamic_range_db: float = 6.0,
+    max_flatness: float = 0.45,
+) -> VADResult:
+    """Remove silence from a clip.
+
+    A frame counts as speech when it is louder than both ``threshold_db`` and
+    the estimated noise floor plus ``noise_margin_db`` (capped at 20 dB below
+    the loudest frame). A run of such frames is kept only if its loudest
+    frame is at least ``min_dynamic_range_db`` above the noise floor and its
+    median spectral flatness is at most ``max_flatness``, which rejects
+    steady noise that is merely loud. Speech regions are padded by
+    ``padding_ms`` on each side, pauses longer than ``max_pause_ms`` are
+    shortened to that length, and clips with less than ``min_speech_ms`` of
+    speech are treated as silent.
+    """
+    frame_samples = max(1, int(sample_rate * frame_ms / 1000))
+    energy = frame_energy_db(audio, frame_samples)
+    if energy.size == 0:
+        return VADResult(np.zeros(0, dtype=np.float32), audio.size, sample_rate)
+
+    # Clips that are speech from start to end have no real noise floor, so the
+    # adaptive threshold never rises above 20 dB below the loudest frame
+    noise_floor = float(np.percentile(energy, 10))
+    adaptive_db = min(noise_floor + noise_margin_db, float(energy.max()) - 20.0)
+    speech = energy > max(threshold_db, adaptive_db)
+    if speech.any():
+        flatness = frame_spectral_flatness(audio, frame_samples)
+        for start, end in _speech_runs(speech):
+            if (
+                energy[start:end].max() - noise_floor < min_dynamic_range_db
+                or float(np.median(flatness[start:end])) > max_flatness
+            ):
+                speech[start:end] = False
+    if not speech.any() or speech.sum() * frame_ms < min_speech_ms:
+        return VADResult(np.zeros(0, dtype=np.float32), audio.size, sample_rate)
+
+    # Dilate speech frames by the padding so word onsets and tails survive
+    pad_frames = int(padding_ms / frame_ms)
+    if pad_frames:
+        kernel = np.ones(2 * pad_frames + 1, dtype=np.int32)
+        dilated = np.convolve(speech.astype(np.int32), kernel, mode="full")
+        speech = dilated[pad_frames:pad_frames + speech.size] > 0
+
+    # Keep speech frames and at most max_pause_ms of every pause between them
+    keep = speech.copy()
+    max_pause_frames = int(max_pause_ms / frame_ms)
+    speech_idx = np.flatnonzero(speech)
+    first, last = speech_idx[0], speech_idx[-1]
+    gaps = np.flatnonzero(np.diff(speech_idx) > 1)
+    for gap in gaps:
+        start, end = speech_idx[gap] + 1, speech_idx[gap + 1]
+        keep[start:start + min(end - start, max_pause_frames)] = True
+    keep[:first] = False
+    keep[last + 1:] = False
+
+    sample_mask = np.repeat(keep, frame_samples)
+    tail = audio[sample_mask.size:]
+    trimmed = audio[:sample_mask.size][sample_mask]
+    # The partial frame at the end belongs to the clip if the last frame was speech
+    if keep[-1] and tail.size:
+        trimmed = np.concatenate([trimmed, tail])
+    return VADResult(np.ascontiguousarray(trimmed, dtype=np.float32), audio.size, sample_rate)